@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from listener import AudioListener
+
+
+class AsyncAudioStream:
+    """Awaitable view of the listener's audio source.
+
+    The source's callback thread stores each block in the listener's ring
+    buffer and pokes the event loop; the loop awaits spans instead of
+    polling a queue.
+    """
+
+    def __init__(self, listener, loop):
+        self.listener = listener
+        self.loop = loop
+        self.data_ready = asyncio.Event()
+        self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        self.listener.audio_callback(indata, frames, time_info, status)
+        self.loop.call_soon_threadsafe(self.data_ready.set)
+
+    async def __aenter__(self):
+        self._stream = self.listener.source.open(self._callback)
+        self._stream.__enter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        # Closing a stream can block (PortAudio, replay thread join), so keep it off the loop
+        await self.loop.run_in_executor(None, self._stream.__exit__, None, None, None)
+        return False
+
+    async def read(self, count=1):
+        """Wait for up to `count` blocks, like AudioRingBuffer.get(). Returns (slot, n), or None without audio."""
+        listener = self.listener
+        ring = listener.audio_buffer
+        deadline = self.loop.time() + (0.1 if listener.source.lossless else 1.0)
+        while len(ring) < count:
+            remaining = deadline - self.loop.time()
+            if remaining <= 0 or listener.paused or not listener.running or listener.source.finished.is_set():
+                break
+            self.data_ready.clear()
+            if len(ring) >= count:
+                break # A block landed between the check and the clear
+            try:
+                await asyncio.wait_for(self.data_ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return ring.get(timeout=0, count=count)
+
+
+class AsyncAudioListener(AudioListener):
+    """asyncio flavour of AudioListener, for embedding in an existing event loop.
+
+    Same config, phrases, VAD and recognizer as the thread API, but audio is
+    awaited rather than polled, pause/resume are events rather than a sleep
+    loop, the ACTIVE timeout is a loop timer that fires on time even when no
+    audio arrives, and actions run in an executor. on_detection may be a
+    coroutine function, and every event is also put on the `events` queue.
+
+    Decoding and the state machine run on one dedicated executor thread
+    (Kaldi releases the GIL), which also serializes them with the timer.
+
+        listener = AsyncAudioListener(config, launcher)
+        task = asyncio.create_task(listener.run())
+        event, text = await listener.events.get()
+    """
+
+    def __init__(self, config, launcher, **kwargs):
+        super().__init__(config, launcher, **kwargs)
+        self.loop = None
+        self.events = asyncio.Queue(maxsize=100)
+        self._resumed = asyncio.Event()
+        self._stream = None
+        self._timeout_handle = None
+        self._decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decoder")
+
+    # Thread-safe controls
+
+    def set_paused(self, paused):
+        super().set_paused(paused)
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._apply_pause)
+
+    def stop(self):
+        super().stop()
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._apply_pause)
+
+    def _apply_pause(self):
+        if self.paused and self.running:
+            self._resumed.clear()
+        else:
+            self._resumed.set()
+        if self._stream:
+            self._stream.data_ready.set() # Wake a pending read so the loop sees the change
+
+    # Hooks called from the decoder thread
+
+    def emit(self, event, text=""):
+        self.loop.call_soon_threadsafe(self._on_event, event, text)
+
+    def dispatch(self, actions):
+        self.loop.call_soon_threadsafe(self._dispatch, actions)
+
+    def _dispatch(self, actions):
+        future = self.loop.run_in_executor(None, AudioListener.dispatch, self, actions)
+        future.add_done_callback(self._dispatch_done)
+
+    def _dispatch_done(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            error = future.exception()
+            logging.error(f"Launching apps failed: {error}", exc_info=(type(error), error, error.__traceback__))
+
+    def arm_timeout(self):
+        pass # Live audio uses the event loop's timer instead (see _on_event)
+
+    def cancel_timeout(self):
+        pass
+
+    # Loop side
+
+    def _on_event(self, event, text):
+        if event == "wake" and not self.source.lossless:
+            self._cancel_timeout()
+            wake_time = self.last_wake_time
+            self._timeout_handle = self.loop.call_later(self.active_timeout, self._on_timer, wake_time)
+        elif event in ("trigger", "timeout"):
+            self._cancel_timeout()
+
+        if self.events.full():
+            self.events.get_nowait() # Nobody is consuming; keep the newest events
+        self.events.put_nowait((event, text))
+        if self.on_detection:
+            result = self.on_detection(event, text)
+            if asyncio.iscoroutine(result):
+                self.loop.create_task(result)
+
+    def _on_timer(self, wake_time):
+        self._timeout_handle = None
+        self.loop.run_in_executor(self._decoder, self._expire, wake_time)
+
+    def _expire(self, wake_time):
+        # Runs on the decoder thread; ignore if a command or a newer wake got there first
+        if self.state == "ACTIVE" and self.last_wake_time == wake_time:
+            self.expire_active()
+
+    def _cancel_timeout(self):
+        if self._timeout_handle:
+            self._timeout_handle.cancel()
+            self._timeout_handle = None
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        if not self.ready.is_set():
+            await self.loop.run_in_executor(None, self.load)
+        self.running = True
+        self._apply_pause()
+        logging.info("Async listener started.")
+
+        try:
+            while self.running:
+                await self._resumed.wait()
+                if not self.running:
+                    break
+                logging.info("Microphone Active. Listening...")
+                try:
+                    await self.loop.run_in_executor(self._decoder, self.prepare_stream)
+                    async with AsyncAudioStream(self, self.loop) as stream:
+                        self._stream = stream
+                        self.stream_backoff.reset()
+                        while self.running and not self.paused:
+                            batch = self.idle_batch if self.state == "IDLE" else 1
+                            waited = time.perf_counter_ns()
+                            span = await stream.read(batch)
+                            self.metrics.maybe_log()
+                            if span is None:
+                                if self.source.finished.is_set() and not len(self.audio_buffer):
+                                    await self.loop.run_in_executor(self._decoder, self.finish_source)
+                                continue
+                            self.metrics.queue_wait.time(waited)
+                            await self.loop.run_in_executor(self._decoder, self.process_span, *span)
+                    await self.loop.run_in_executor(self._decoder, self.end_stream)
+                except Exception as e:
+                    logging.error(f"Audio stream error: {e}")
+                    if not self.stream_backoff.attempts:
+                        self.stream_backoff.reset() # Time the outage from its first failure, not the last open
+                    await asyncio.sleep(self.stream_backoff.next_delay())
+                finally:
+                    self._stream = None
+        finally:
+            self._cancel_timeout()
+            logging.info("Async listener stopped.")
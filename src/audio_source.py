@@ -0,0 +1,294 @@
+import contextlib
+import os
+import threading
+import time
+import wave
+import logging
+import numpy as np
+from backoff import Backoff
+
+# Capture profiles. block_ms is the stream block size (and the decode step while ACTIVE);
+# idle_block_ms is how much audio is decoded per step while IDLE. Any key can be
+# overridden individually in config.json.
+CAPTURE_PROFILES = {
+    "default": {"block_ms": 250, "idle_block_ms": 250, "device_latency": "high", "audio_buffer_blocks": 16},
+    "low-latency": {"block_ms": 40, "idle_block_ms": 40, "device_latency": "low", "audio_buffer_blocks": 64},
+    # Small blocks so ACTIVE reacts quickly, batched into large decode steps while IDLE
+    "adaptive": {"block_ms": 40, "idle_block_ms": 240, "device_latency": "low", "audio_buffer_blocks": 64},
+}
+
+
+def capture_settings(config, sample_rate=16000):
+    """Resolve the capture profile in config into concrete stream/buffer sizes."""
+    name = config.get("capture_profile", "default")
+    if name not in CAPTURE_PROFILES:
+        logging.warning(f"Unknown capture_profile '{name}', using 'default'.")
+        name = "default"
+    profile = dict(CAPTURE_PROFILES[name])
+    profile.update({key: config[key] for key in profile if key in config})
+
+    blocksize = max(1, int(sample_rate * profile["block_ms"] / 1000))
+    idle_batch = max(1, round(profile["idle_block_ms"] / profile["block_ms"]))
+    return {
+        "profile": name,
+        "sample_rate": sample_rate,
+        "blocksize": blocksize,
+        "idle_batch": idle_batch, # Blocks decoded together while IDLE
+        "device_latency": profile["device_latency"],
+        # Room for at least two idle batches so the writer never waits on a full batch
+        "buffer_blocks": max(profile["audio_buffer_blocks"], 2 * idle_batch),
+    }
+
+
+class AudioSource:
+    """Base class for things that deliver int16 mono blocks to the listener.
+
+    A source is used like sounddevice's streams: `with source.open(callback):`
+    starts delivery and leaving the block stops it. The callback has the
+    sounddevice signature callback(indata, frames, time, status) and is called
+    from the source's own thread.
+
+    Live sources drop audio when the consumer falls behind. Replay sources are
+    `lossless`: the consumer is expected to apply back-pressure instead, so
+    they can run faster than real time without losing blocks.
+    """
+
+    lossless = False
+
+    def __init__(self, sample_rate=16000, blocksize=4000):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        # Rate the audio is actually delivered at; the listener resamples to sample_rate if it differs
+        self.capture_rate = sample_rate
+        self.finished = threading.Event()  # Set once a finite source runs out
+
+    @property
+    def capture_blocksize(self):
+        """Frames per delivered block, so one block covers the same time at capture_rate."""
+        if self.capture_rate == self.sample_rate:
+            return self.blocksize
+        return max(1, round(self.blocksize * self.capture_rate / self.sample_rate))
+
+    def resolve_capture_rate(self):
+        """Rate the next open() will deliver at."""
+        return self.capture_rate
+
+    def open(self, callback):
+        raise NotImplementedError
+
+    def wait_ready(self, timeout):
+        """Block until the source can be opened (at most `timeout` seconds). Returns True if ready."""
+        return True
+
+
+class MicrophoneSource(AudioSource):
+    """Live capture through sounddevice/PortAudio.
+
+    By default the stream runs at the device's native rate (many USB mics do
+    not support 16 kHz, or resample it badly in the driver) and the listener
+    resamples to the model rate. capture_rate can also be a number, or None
+    to open the stream at the model rate as before.
+    """
+
+    # Streams open in this process, across all sources (re-scanning devices would invalidate them)
+    _open_streams = 0
+    _open_lock = threading.Lock()
+
+    def __init__(self, sample_rate=16000, blocksize=4000, device=None, latency="high", capture_rate="native"):
+        super().__init__(sample_rate, blocksize)
+        self.device = device
+        self.latency = latency # "low", "high" or seconds, passed through to PortAudio
+        self.requested_rate = capture_rate
+        if capture_rate not in ("native", None):
+            self.capture_rate = int(capture_rate)
+
+    def resolve_capture_rate(self):
+        """Look up the device's default rate when capturing natively."""
+        if self.requested_rate != "native":
+            return self.capture_rate
+        import sounddevice as sd
+        try:
+            info = sd.query_devices(self.device, kind='input')
+            self.capture_rate = int(info['default_samplerate'])
+        except Exception as e:
+            logging.warning(f"Could not query the input device's native rate, using {self.sample_rate} Hz: {e}")
+            self.capture_rate = self.sample_rate
+        return self.capture_rate
+
+    @contextlib.contextmanager
+    def open(self, callback):
+        # Imported here so replay sources work on machines without PortAudio
+        import sounddevice as sd
+        self.resolve_capture_rate()
+        with MicrophoneSource._open_lock: # Counted before PortAudio sees the stream, so no re-scan can race it
+            MicrophoneSource._open_streams += 1
+        try:
+            stream = sd.RawInputStream(samplerate=self.capture_rate, blocksize=self.capture_blocksize,
+                                       device=self.device, latency=self.latency, dtype='int16', channels=1,
+                                       callback=callback)
+            with stream:
+                yield stream
+        finally:
+            with MicrophoneSource._open_lock:
+                MicrophoneSource._open_streams -= 1
+
+    def wait_ready(self, timeout):
+        """Probe with exponential backoff until the device accepts our stream settings."""
+        import sounddevice as sd
+        backoff = Backoff(initial=0.05, max_delay=2.0, budget=timeout)
+        while True:
+            try:
+                sd.check_input_settings(device=self.device, channels=1, dtype='int16',
+                                        samplerate=self.resolve_capture_rate())
+                logging.info(f"Audio device ready after {backoff.elapsed:.2f}s ({backoff.attempts} retries).")
+                return True
+            except Exception as e:
+                if not backoff.sleep():
+                    logging.warning(f"Audio device not ready after {backoff.elapsed:.2f}s: {e}")
+                    return False
+                # PortAudio only enumerates devices at init, so re-scan to see ones that appeared. That
+                # re-initializes PortAudio for the whole process and kills every open stream (another
+                # device's, an enrollment recording), so it's only done while none is open, i.e. in
+                # the startup probe. Later, the stream-open retry loop handles devices coming back.
+                with MicrophoneSource._open_lock:
+                    if MicrophoneSource._open_streams == 0 and hasattr(sd, "_terminate"):
+                        sd._terminate()
+                        sd._initialize()
+
+
+class _ReplayStream:
+    """Context manager that pumps blocks from a replay source on a thread."""
+
+    def __init__(self, source, callback):
+        self.source = source
+        self.callback = callback
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self._pump, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        return False
+
+    def _pump(self):
+        source = self.source
+        block_seconds = source.capture_blocksize / source.capture_rate
+        start = time.perf_counter()
+        sent = 0
+        for block in source._blocks():
+            if self.stop_event.is_set():
+                return
+            if source.speed:
+                # Pace delivery against the wall clock (speed=2.0 is twice real time)
+                due = start + sent * block_seconds / source.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.callback(block, len(block), None, None)
+            sent += 1
+        source.finished.set()
+
+
+class _ReplaySource(AudioSource):
+    lossless = True
+
+    def __init__(self, sample_rate=16000, blocksize=4000, speed=None):
+        super().__init__(sample_rate, blocksize)
+        self.speed = speed  # None/0 = as fast as the consumer allows, 1.0 = real time
+
+    def open(self, callback):
+        return _ReplayStream(self, callback)
+
+    def _blocks(self):
+        raise NotImplementedError
+
+
+class FileSource(_ReplaySource):
+    """Replays a WAV file or headerless 16-bit PCM (.raw/.pcm).
+
+    WAV files are replayed at their own rate (the listener resamples them like
+    a native-rate microphone); raw PCM is assumed to be at the model rate.
+    """
+
+    def __init__(self, path, sample_rate=16000, blocksize=4000, speed=None, loop=False):
+        super().__init__(sample_rate, blocksize, speed)
+        self.path = path
+        self.loop = loop
+        self.samples = self._load()
+        self.position = 0  # Kept across pause/resume so replay continues where it stopped
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.capture_rate
+
+    def _load(self):
+        if os.path.splitext(self.path)[1].lower() in ('.raw', '.pcm'):
+            with open(self.path, 'rb') as f:
+                return np.frombuffer(f.read(), dtype='<i2')
+
+        with wave.open(self.path, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"{self.path}: expected 16-bit PCM, got {wf.getsampwidth() * 8}-bit")
+            self.capture_rate = wf.getframerate()
+            samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype='<i2')
+            channels = wf.getnchannels()
+        if channels > 1:
+            # Keep the first channel only
+            samples = np.ascontiguousarray(samples[::channels])
+        return samples
+
+    def _blocks(self):
+        while True:
+            blocksize = self.capture_blocksize
+            while self.position < len(self.samples):
+                block = self.samples[self.position:self.position + blocksize]
+                self.position += len(block)
+                yield block
+            if not self.loop:
+                return
+            self.position = 0
+
+
+class GeneratorSource(_ReplaySource):
+    """Replays int16 arrays from any iterable, re-chunked to the block size."""
+
+    def __init__(self, chunks, sample_rate=16000, blocksize=4000, speed=None):
+        super().__init__(sample_rate, blocksize, speed)
+        self.chunks = iter(chunks)
+
+    def _blocks(self):
+        pending = np.empty(0, dtype=np.int16)
+        for chunk in self.chunks:
+            pending = np.concatenate((pending, np.asarray(chunk, dtype=np.int16)))
+            while len(pending) >= self.blocksize:
+                yield pending[:self.blocksize]
+                pending = pending[self.blocksize:]
+        if len(pending):
+            yield pending
+
+
+def synthetic_noise(seconds, level=100.0, sample_rate=16000, chunk_seconds=1.0, seed=0):
+    """Yield white noise in int16 chunks; handy for idle-CPU and VAD measurements."""
+    rng = np.random.default_rng(seed)
+    remaining = int(seconds * sample_rate)
+    chunk = int(chunk_seconds * sample_rate)
+    while remaining > 0:
+        n = min(chunk, remaining)
+        yield np.clip(rng.normal(0.0, level, n), -32768, 32767).astype(np.int16)
+        remaining -= n
+
+
+def create_audio_source(config, settings):
+    """Build the source selected in config: a replay file if audio_file is set, else the microphone."""
+    sample_rate, blocksize = settings["sample_rate"], settings["blocksize"]
+    path = config.get("audio_file")
+    if path:
+        return FileSource(path, sample_rate, blocksize, speed=config.get("audio_file_speed", 1.0),
+                          loop=config.get("audio_file_loop", False))
+    return MicrophoneSource(sample_rate, blocksize, device=config.get("input_device"),
+                            latency=settings["device_latency"], capture_rate=config.get("capture_rate", "native"))
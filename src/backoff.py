@@ -0,0 +1,47 @@
+import time
+
+
+class Backoff:
+    """Exponential backoff for retrying something that is not available yet.
+
+    Delays start small so a device that becomes ready quickly is picked up
+    almost immediately, then double up to max_delay so a missing device is
+    not hammered. With a budget, sleep() returns False once the total time
+    spent waiting would exceed it.
+    """
+
+    def __init__(self, initial=0.05, factor=2.0, max_delay=5.0, budget=None):
+        self.initial = initial
+        self.factor = factor
+        self.max_delay = max_delay
+        self.budget = budget
+        self.reset()
+
+    def reset(self):
+        self.attempts = 0
+        self.delay = self.initial
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def next_delay(self):
+        """Delay before the next attempt, or None if the budget is used up."""
+        self.attempts += 1
+        delay = self.delay
+        if self.budget is not None:
+            remaining = self.budget - self.elapsed
+            if remaining <= 0:
+                return None
+            delay = min(delay, remaining)
+        self.delay = min(self.delay * self.factor, self.max_delay)
+        return delay
+
+    def sleep(self):
+        """Wait before the next attempt. Returns False if the budget is used up."""
+        delay = self.next_delay()
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
@@ -0,0 +1,323 @@
+"""Offline wake/trigger benchmark.
+
+Replays a labelled corpus through AudioListener as fast as the decoder
+allows and reports detection latency, false accept/reject rates and CPU
+cost. No microphone or sound hardware is needed.
+
+The corpus is a directory with a corpus.json manifest:
+
+    {"clips": [
+        {"file": "wake_01.wav", "kind": "wake", "wake_end": 1.20},
+        {"file": "cmd_01.wav", "kind": "command", "wake_end": 1.10, "trigger_end": 2.45},
+        {"file": "tv_01.wav", "kind": "noise"},
+        {"file": "hay_01.wav", "kind": "near_miss"}
+    ]}
+
+Kinds: "wake" (wake phrase only), "command" (wake phrase then trigger
+phrase), "trigger" (trigger phrase without the wake phrase), "noise" and
+"near_miss" (neither should fire). wake_end/trigger_end are the times in
+seconds at which the phrase finishes; latencies are measured from there.
+
+Usage: python src/benchmark.py corpus_dir [--config config.json] [--model model] [--json out.json]
+                               [--profile adaptive] [--block-ms 20,40,100,250]
+
+Clips can be WAVs at any rate; ones not at 16 kHz are resampled the same way
+a native-rate microphone is, and the resampler's CPU cost is reported.
+
+--block-ms repeats the run once per block size and prints decode CPU and
+latency against block size, to help pick a capture profile per machine.
+
+With kws_cascade on, the report also gives the wake spotter's hit rate,
+how many hits Vosk confirmed and the CPU spent in each stage.
+The log-mel/MFCC extractor's single-core throughput (frames per
+CPU-second) is measured on synthetic audio and always reported.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+
+from audio_source import FileSource
+from listener import AudioListener
+from features import measure_throughput
+from resampler import measure_cost
+
+EXPECTS_WAKE = {"wake", "command"}
+EXPECTS_TRIGGER = {"command"}
+
+
+class StubLauncher:
+    """Stands in for AppLauncher: records the launch and ends the clip."""
+
+    def __init__(self):
+        self.apps = []
+        self.listener = None
+        self.launches = 0
+
+    def launch_all(self):
+        self.launches += 1
+        self.listener.stop()
+
+    def run_actions(self, actions):
+        self.launch_all()
+
+
+def load_corpus(corpus_dir):
+    with open(os.path.join(corpus_dir, "corpus.json"), "r") as f:
+        manifest = json.load(f)
+    clips = manifest["clips"] if isinstance(manifest, dict) else manifest
+    for clip in clips:
+        clip["path"] = os.path.join(corpus_dir, clip["file"])
+    return clips
+
+
+def run_clip(clip, config, model, listener_class=AudioListener):
+    """Replay one clip and return what the listener did with it."""
+    launcher = StubLauncher()
+    source = FileSource(clip["path"], speed=None)
+    listener = listener_class(config, launcher, source=source, model=model)
+    launcher.listener = listener
+
+    events = []
+    listener.on_detection = lambda event, text: events.append(
+        (event, listener.samples_processed / listener.sample_rate))
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        listener.run()
+    return {
+        "file": clip["file"],
+        "kind": clip["kind"],
+        "audio_seconds": source.duration,
+        "cpu_seconds": time.process_time() - cpu_start,
+        "wall_seconds": time.perf_counter() - wall_start,
+        "events": events,
+        "stats": listener.stats(),
+        "block_ms": 1000.0 * listener.blocksize / listener.sample_rate,
+    }
+
+
+def _first(events, name):
+    for event, at in events:
+        if event == name:
+            return at
+    return None
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(np.max(values)),
+        "n": len(values),
+    }
+
+
+def _rate(hits, total):
+    return hits / total if total else None
+
+
+def summarize(clips, runs):
+    wake_latency, trigger_latency = [], []
+    wake_expected = wake_missed = wake_negative = wake_false = 0
+    trig_expected = trig_missed = trig_negative = trig_false = 0
+    negative_audio = 0.0
+
+    for clip, run in zip(clips, runs):
+        kind = clip["kind"]
+        woke = _first(run["events"], "wake")
+        triggered = _first(run["events"], "trigger")
+
+        if kind in EXPECTS_WAKE:
+            wake_expected += 1
+            if woke is None:
+                wake_missed += 1
+            elif "wake_end" in clip:
+                wake_latency.append(woke - clip["wake_end"])
+        else:
+            wake_negative += 1
+            negative_audio += run["audio_seconds"]
+            if woke is not None:
+                wake_false += 1
+
+        if kind in EXPECTS_TRIGGER:
+            trig_expected += 1
+            if triggered is None:
+                trig_missed += 1
+            elif "trigger_end" in clip:
+                trigger_latency.append(triggered - clip["trigger_end"])
+        else:
+            trig_negative += 1
+            if triggered is not None:
+                trig_false += 1
+
+    audio_seconds = sum(r["audio_seconds"] for r in runs)
+    cpu_seconds = sum(r["cpu_seconds"] for r in runs)
+    wall_seconds = sum(r["wall_seconds"] for r in runs)
+    blocks = sum(r["stats"]["vad"]["blocks_total"] for r in runs if r["stats"]["vad"])
+    skipped = sum(r["stats"]["vad"]["blocks_skipped"] for r in runs if r["stats"]["vad"])
+    # Clips recorded at another rate go through the resampler; average its cost over their audio
+    resampled = [r for r in runs if r["stats"].get("resampler")]
+    resampled_audio = sum(r["audio_seconds"] for r in resampled)
+    resampler_cost = sum(r["stats"]["resampler"]["cost_per_second"] * r["audio_seconds"]
+                         for r in resampled) / resampled_audio if resampled_audio else None
+    denoised = [r["stats"]["denoise"] for r in runs if r["stats"].get("denoise") and r["stats"]["denoise"]["blocks"]]
+    denoise_blocks = sum(d["blocks"] for d in denoised)
+    denoise_seconds = sum(d["cpu_seconds"] for d in denoised)
+    clap_seconds = sum(r["stats"]["clap"]["cpu_seconds"] for r in runs if r["stats"].get("clap"))
+    cascades = [r["stats"]["kws"] for r in runs if r["stats"].get("kws")]
+    kws_hits = sum(k["hits"] for k in cascades)
+    # Stage 1 is the spotter's matching plus the MFCCs it runs on
+    stage1_seconds = sum(k["stage1_cpu_seconds"] for k in cascades) + sum(
+        r["stats"]["features"]["cpu_seconds"] for r in runs if r["stats"].get("kws"))
+    stage2_seconds = sum(k["stage2_cpu_seconds"] for k in cascades)
+
+    return {
+        "clips": len(runs),
+        "audio_seconds": audio_seconds,
+        "wake_latency": _percentiles(wake_latency),
+        "trigger_latency": _percentiles(trigger_latency),
+        "wake_false_reject_rate": _rate(wake_missed, wake_expected),
+        "wake_false_accept_rate": _rate(wake_false, wake_negative),
+        "wake_false_accepts_per_hour": wake_false * 3600.0 / negative_audio if negative_audio else None,
+        "trigger_false_reject_rate": _rate(trig_missed, trig_expected),
+        "trigger_false_accept_rate": _rate(trig_false, trig_negative),
+        "cpu_seconds_per_audio_hour": cpu_seconds * 3600.0 / audio_seconds if audio_seconds else None,
+        "realtime_factor": wall_seconds / audio_seconds if audio_seconds else None,
+        "vad_skipped_fraction": _rate(skipped, blocks),
+        "resampler_cpu_seconds_per_audio_second": resampler_cost,
+        # Synthetic cost at the usual native mic rates, so it is reported even for an all-16 kHz corpus
+        "resampler_cost_by_rate": {rate: measure_cost(rate) for rate in (44100, 48000)},
+        # Denoise only runs on blocks the VAD passes, so report it per block as well as per audio-second
+        "denoise_mean_block_ms": 1000.0 * denoise_seconds / denoise_blocks if denoise_blocks else None,
+        "denoise_max_block_ms": max((d["max_block_ms"] for d in denoised), default=None),
+        "denoise_cpu_seconds_per_audio_second": denoise_seconds / audio_seconds if denoised and audio_seconds else None,
+        # Wake cascade: how often stage 1 woke Vosk, how often Vosk agreed, and where the IDLE CPU went
+        "kws_hits": kws_hits if cascades else None,
+        "kws_hits_per_hour": kws_hits * 3600.0 / audio_seconds if cascades and audio_seconds else None,
+        "kws_confirm_rate": _rate(sum(k["confirmed"] for k in cascades), kws_hits),
+        "kws_stage1_cpu_seconds_per_audio_second": stage1_seconds / audio_seconds if cascades and audio_seconds else None,
+        "kws_stage2_cpu_seconds_per_audio_second": stage2_seconds / audio_seconds if cascades and audio_seconds else None,
+        # Clap detection runs on every block, with no recognizer involved
+        "clap_cpu_seconds_per_audio_second": clap_seconds / audio_seconds if clap_seconds and audio_seconds else None,
+        # Synthetic single-core feature extraction throughput (log-mel + MFCC frames per CPU-second)
+        "feature_frames_per_second": measure_throughput(),
+    }
+
+
+def run_corpus(clips, config, model):
+    runs = []
+    for clip in clips:
+        runs.append(run_clip(clip, config, model))
+        print(f"  {clip['file']}: {[e for e, _ in runs[-1]['events']]}", file=sys.stderr)
+    return runs
+
+
+def print_block_sweep(sweep):
+    print("block_ms  cpu_s/audio_h  rtf     wake_p50  trigger_p50")
+    for block_ms, summary in sweep:
+        wake = summary["wake_latency"]
+        trig = summary["trigger_latency"]
+        print(f"{block_ms:8g}  {summary['cpu_seconds_per_audio_hour'] or 0:13.1f}  "
+              f"{summary['realtime_factor'] or 0:.4f}  "
+              f"{wake['p50'] if wake else float('nan'):8.3f}  {trig['p50'] if trig else float('nan'):11.3f}")
+
+
+def print_report(summary):
+    def fmt(value, pct=False):
+        if value is None:
+            return "n/a"
+        return f"{value * 100:.1f}%" if pct else f"{value:.3f}"
+
+    print(f"Clips: {summary['clips']}  Audio: {summary['audio_seconds']:.1f}s")
+    for name in ("wake_latency", "trigger_latency"):
+        lat = summary[name]
+        if lat:
+            print(f"{name}: p50={lat['p50']:.3f}s p90={lat['p90']:.3f}s p99={lat['p99']:.3f}s "
+                  f"max={lat['max']:.3f}s (n={lat['n']})")
+        else:
+            print(f"{name}: n/a")
+    print(f"Wake    FRR={fmt(summary['wake_false_reject_rate'], True)} "
+          f"FAR={fmt(summary['wake_false_accept_rate'], True)} "
+          f"FA/h={fmt(summary['wake_false_accepts_per_hour'])}")
+    print(f"Trigger FRR={fmt(summary['trigger_false_reject_rate'], True)} "
+          f"FAR={fmt(summary['trigger_false_accept_rate'], True)}")
+    print(f"CPU-s per audio-hour: {fmt(summary['cpu_seconds_per_audio_hour'])}  "
+          f"Real-time factor: {fmt(summary['realtime_factor'])}  "
+          f"VAD skipped: {fmt(summary['vad_skipped_fraction'], True)}")
+    corpus_cost = summary["resampler_cpu_seconds_per_audio_second"]
+    costs = [f"corpus {corpus_cost * 1000:.2f} ms" if corpus_cost is not None else "corpus n/a"]
+    costs += [f"{rate} Hz {cost * 1000:.2f} ms" for rate, cost in summary["resampler_cost_by_rate"].items()]
+    print(f"Resampler CPU per audio-second: {'  '.join(costs)}")
+    if summary["denoise_mean_block_ms"] is not None:
+        print(f"Denoise: mean {summary['denoise_mean_block_ms']:.3f} ms/block  "
+              f"max {summary['denoise_max_block_ms']:.3f} ms/block  "
+              f"CPU per audio-second {summary['denoise_cpu_seconds_per_audio_second'] * 1000:.2f} ms")
+    if summary["kws_hits"] is not None:
+        print(f"Wake cascade: {summary['kws_hits']} stage-1 hits ({fmt(summary['kws_hits_per_hour'])}/h), "
+              f"confirmed {fmt(summary['kws_confirm_rate'], True)}  CPU per audio-second: "
+              f"stage 1 {summary['kws_stage1_cpu_seconds_per_audio_second'] * 1000:.2f} ms, "
+              f"stage 2 {summary['kws_stage2_cpu_seconds_per_audio_second'] * 1000:.2f} ms")
+    if summary["clap_cpu_seconds_per_audio_second"] is not None:
+        print(f"Clap detector CPU per audio-second: {summary['clap_cpu_seconds_per_audio_second'] * 1000:.2f} ms")
+    print(f"Feature extraction: {summary['feature_frames_per_second']:.0f} frames per CPU-second "
+          f"({summary['feature_frames_per_second'] / 100:.0f}x real time at 10 ms hop)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a labelled corpus through the listener.")
+    parser.add_argument("corpus", help="Directory containing corpus.json and the clips")
+    parser.add_argument("--config", default="config.json", help="Listener config (phrases, VAD, ...)")
+    parser.add_argument("--model", help="Vosk model directory (overrides model_path in config)")
+    parser.add_argument("--json", help="Also write the summary and per-clip results to this file")
+    parser.add_argument("--profile", help="Capture profile to use (default, low-latency, adaptive)")
+    parser.add_argument("--block-ms", help="Comma-separated block sizes in ms to sweep, e.g. 20,40,100,250")
+    args = parser.parse_args()
+
+    try:
+        with open(args.config, "r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    config.pop("audio_file", None)
+    config["clip_capture"] = False # Replayed events must not land in the clip store this corpus may come from
+    if args.model:
+        config["model_path"] = args.model
+    if args.profile:
+        config["capture_profile"] = args.profile
+
+    import vosk
+    model = vosk.Model(config.get("model_path", "model"))
+
+    clips = load_corpus(args.corpus)
+
+    if args.block_ms:
+        sweep = []
+        for block_ms in [float(v) for v in args.block_ms.split(",")]:
+            print(f"Block size {block_ms:g} ms:", file=sys.stderr)
+            runs = run_corpus(clips, dict(config, block_ms=block_ms, idle_block_ms=block_ms), model)
+            sweep.append((block_ms, summarize(clips, runs)))
+        print_block_sweep(sweep)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"block_sweep": [{"block_ms": b, "summary": s} for b, s in sweep]}, f, indent=4)
+        return
+
+    runs = run_corpus(clips, config, model)
+    summary = summarize(clips, runs)
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "clips": runs}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
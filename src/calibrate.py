@@ -0,0 +1,173 @@
+"""Pick per-phrase confidence thresholds from a labelled corpus.
+
+Replays the benchmark corpus (see benchmark.py for the corpus.json format)
+with every threshold disabled, records the word confidence of each phrase
+match, and for every phrase chooses the lowest threshold whose false-accept
+rate on the clips that should not fire it stays at or below --target-far.
+Command clips may name their command phrase with a "phrase" key; otherwise
+any command match counts for them. Every wake and command clip counts
+towards the wake phrase.
+
+Clips are decoded in parallel, one worker process per core, each with its
+own copy of the model.
+
+Usage: python src/calibrate.py corpus_dir [--config config.json] [--model model] [--target-far 0.01]
+                                [--workers 8] [--json out.json] [--write]
+
+--write stores the thresholds as confidence_thresholds in the config file.
+"""
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import sys
+import time
+
+from benchmark import EXPECTS_TRIGGER, EXPECTS_WAKE, load_corpus, run_clip
+from intents import build_command_table, phrase_confidence
+from listener import AudioListener
+
+
+class CalibrationListener(AudioListener):
+    """Lets every phrase match through and records its confidence."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.candidates = []
+
+    def accept_phrase(self, phrase, words, early=False):
+        if words is None:
+            return False # Early detection is off during calibration; nothing to score
+        self.candidates.append((phrase, phrase_confidence(phrase, words)))
+        return True
+
+    def stats(self):
+        stats = super().stats()
+        stats["candidates"] = self.candidates
+        return stats
+
+
+_worker = {}
+
+
+def _init_worker(config):
+    import vosk
+    vosk.SetLogLevel(-1)
+    _worker["config"] = config
+    _worker["model"] = vosk.Model(config.get("model_path", "model"))
+
+
+def _replay(clip):
+    return run_clip(clip, _worker["config"], _worker["model"], listener_class=CalibrationListener)
+
+
+def replay_corpus(clips, config, workers):
+    """Replay every clip across `workers` processes; results come back in clip order."""
+    runs = []
+    with mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(config,)) as pool:
+        for clip, run in zip(clips, pool.imap(_replay, clips)):
+            print(f"  {clip['file']}: {run['stats']['candidates']}", file=sys.stderr)
+            runs.append(run)
+    return runs
+
+
+def _best_score(run, phrase):
+    scores = [conf for p, conf in run["stats"]["candidates"] if p == phrase]
+    return max(scores) if scores else None
+
+
+def choose_threshold(positives, negatives, target_far):
+    """Lowest threshold that keeps the false-accept rate at or below target_far.
+
+    positives/negatives hold each clip's best confidence for the phrase
+    (None when it never matched). Returns (threshold, far, frr).
+    """
+    scores = sorted((s for s in negatives if s is not None), reverse=True)
+    allowed = int(target_far * len(negatives))
+    # Just above the highest negative score we are not allowed to accept
+    threshold = 0.0 if len(scores) <= allowed else math.nextafter(scores[allowed], math.inf)
+    far = sum(s >= threshold for s in scores) / len(negatives) if negatives else None
+    frr = (sum(s is None or s < threshold for s in positives) / len(positives)) if positives else None
+    return threshold, far, frr
+
+
+def calibrate(clips, runs, config, target_far):
+    wake_phrase = config.get("wake_phrase", "wake up").lower()
+    trigger_phrase = config.get("trigger_phrase", "open").lower()
+    commands = build_command_table(dict(config, trigger_phrase=trigger_phrase)).phrases
+    phrases = [(" ".join(wake_phrase.split()), EXPECTS_WAKE)] + [(p, EXPECTS_TRIGGER) for p in commands]
+
+    results = {}
+    for phrase, expects in phrases:
+        positives, negatives = [], []
+        for clip, run in zip(clips, runs):
+            if clip["kind"] not in expects:
+                negatives.append(_best_score(run, phrase))
+            elif expects is EXPECTS_WAKE or clip.get("phrase", phrase).lower() == phrase:
+                # "phrase" names a clip's command; every wake/command clip is a wake positive
+                positives.append(_best_score(run, phrase))
+        threshold, far, frr = choose_threshold(positives, negatives, target_far)
+        results[phrase] = {"threshold": threshold, "far": far, "frr": frr,
+                           "positives": len(positives), "negatives": len(negatives)}
+    return results
+
+
+def print_thresholds(results):
+    def fmt(value):
+        return "n/a" if value is None else f"{value * 100:.1f}%"
+
+    print("phrase                threshold  FAR     FRR     pos/neg")
+    for phrase, r in results.items():
+        note = "  (unusable: negatives at full confidence)" if r["threshold"] > 1.0 else ""
+        print(f"{phrase:<20}  {r['threshold']:<9.3f}  {fmt(r['far']):<6}  {fmt(r['frr']):<6}  "
+              f"{r['positives']}/{r['negatives']}{note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Choose confidence thresholds for a target false-accept rate.")
+    parser.add_argument("corpus", help="Directory containing corpus.json and the clips")
+    parser.add_argument("--config", default="config.json", help="Listener config (phrases, VAD, ...)")
+    parser.add_argument("--model", help="Vosk model directory (overrides model_path in config)")
+    parser.add_argument("--target-far", type=float, default=0.01, help="Allowed false-accept rate per phrase")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Decoder processes")
+    parser.add_argument("--json", help="Also write the thresholds and per-clip scores to this file")
+    parser.add_argument("--write", action="store_true", help="Save the thresholds into the config file")
+    args = parser.parse_args()
+
+    try:
+        with open(args.config, "r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    replay_config = dict(config, early_detection=False, confidence_thresholds={}, min_confidence=0.0,
+                         clip_capture=False) # Replayed events must not land in the clip store
+    replay_config.pop("audio_file", None)
+    if args.model:
+        replay_config["model_path"] = args.model
+
+    clips = load_corpus(args.corpus)
+    started = time.perf_counter()
+    runs = replay_corpus(clips, replay_config, max(1, args.workers))
+    print(f"Replayed {len(clips)} clips in {time.perf_counter() - started:.1f}s "
+          f"with {args.workers} worker(s).", file=sys.stderr)
+
+    results = calibrate(clips, runs, config, args.target_far)
+    print_thresholds(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"thresholds": results,
+                       "clips": [{"file": r["file"], "candidates": r["stats"]["candidates"]} for r in runs]},
+                      f, indent=4)
+    if args.write:
+        # Round up so the stored value still rejects the negative it was placed above
+        config["confidence_thresholds"] = {p: math.ceil(r["threshold"] * 10000) / 10000
+                                           for p, r in results.items() if r["threshold"] <= 1.0}
+        with open(args.config, "w") as f:
+            json.dump(config, f, indent=4)
+        print(f"Thresholds written to {args.config}.")
+
+
+if __name__ == "__main__":
+    main()
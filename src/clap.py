@@ -0,0 +1,121 @@
+import time
+import numpy as np
+
+
+class ClapDetector:
+    """Finds hand claps in the audio stream and reports double claps.
+
+    The audio is cut into 10 ms frames and every frame of a block is scored
+    in one vectorized pass. A frame is a clap when:
+
+    - its peak amplitude reaches `threshold` (the config's clap_threshold),
+    - its RMS jumps at least `sharpness` times above the loudest of the
+      `lookback` frames before it (a clap has almost no attack time),
+    - the level falls back under half within `decay` frames (it's short),
+    - and its spectrum is flat (spectral flatness >= `flatness`): a clap is
+      broadband noise, while voiced speech and music are tonal.
+
+    The spectral test is the only FFT and only runs on frames that passed the
+    cheaper ones. Two claps min_gap..max_gap seconds apart make a double clap.
+    """
+
+    def __init__(self, sample_rate=16000, threshold=3000, sharpness=4.0, flatness=0.2,
+                 min_gap=0.15, max_gap=0.6, lookback=5, decay=3):
+        self.sample_rate = sample_rate
+        self.frame = sample_rate // 100
+        self.threshold = threshold
+        self.sharpness = sharpness
+        self.flatness = flatness
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self.lookback = lookback
+        self.decay = decay
+        self._context = lookback + decay # Frames kept from the previous block
+        self.reset()
+
+        # Counters
+        self.samples_in = 0
+        self.candidates = 0 # Frames that reached the flatness test
+        self.claps = 0
+        self.double_claps = 0
+        self.cpu_seconds = 0.0
+
+    def reset(self):
+        """Forget stream state (between streams)."""
+        self._pending = np.zeros(0, dtype=np.float32) # Samples short of a full frame
+        self._frames = np.zeros((self._context, self.frame), dtype=np.float32)
+        self._rms = np.zeros(self._context, dtype=np.float32)
+        self._frame_index = -self.decay # Stream index of the first frame that can be decided next
+        self._last_clap = None # Stream time of the last single clap
+
+    def process(self, samples):
+        """Feed one block of int16 samples. Returns True if it completed a double clap."""
+        started = time.thread_time()
+        self.samples_in += len(samples)
+        buf = np.concatenate((self._pending, samples.astype(np.float32)))
+        count = len(buf) // self.frame
+        self._pending = buf[count * self.frame:]
+        double = False
+        if count:
+            new = buf[:count * self.frame].reshape(count, self.frame)
+            frames = np.concatenate((self._frames, new))
+            rms = np.concatenate((self._rms, np.sqrt(np.mean(new * new, axis=1))))
+            double = self._score(frames, rms)
+            self._frames = frames[-self._context:]
+            self._rms = rms[-self._context:]
+        self.cpu_seconds += time.thread_time() - started
+        return double
+
+    def _score(self, frames, rms):
+        # Frames lookback..len-decay have their full context; they are the ones decided now
+        n = len(rms) - self._context
+        index = np.arange(self.lookback, self.lookback + n)
+        before = np.lib.stride_tricks.sliding_window_view(rms[:-1], self.lookback)[:n].max(axis=1)
+        after = np.lib.stride_tricks.sliding_window_view(rms[self.lookback + 1:], self.decay)[:n].min(axis=1)
+        level = rms[index]
+        peaks = np.abs(frames[index]).max(axis=1)
+        candidates = index[(peaks >= self.threshold)
+                           & (level >= self.sharpness * (before + 1.0))
+                           & (after <= 0.5 * level)]
+
+        double = False
+        if len(candidates):
+            self.candidates += len(candidates)
+            power = np.abs(np.fft.rfft(frames[candidates], axis=1)[:, 1:]) ** 2 + 1e-6
+            flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+            for i in candidates[flatness >= self.flatness]:
+                at = (self._frame_index + i - self.lookback) * self.frame / self.sample_rate
+                double = self._on_clap(at) or double
+        self._frame_index += n
+        return double
+
+    def _on_clap(self, at):
+        self.claps += 1
+        last, self._last_clap = self._last_clap, at
+        if last is not None and self.min_gap <= at - last <= self.max_gap:
+            self.double_claps += 1
+            self._last_clap = None # A third clap starts a new pair
+            return True
+        return False
+
+    def stats(self):
+        return {
+            "candidates": self.candidates,
+            "claps": self.claps,
+            "double_claps": self.double_claps,
+            "cpu_seconds": self.cpu_seconds,
+            "cost_per_second": self.cpu_seconds / (self.samples_in / self.sample_rate) if self.samples_in else None,
+        }
+
+
+def create_clap_detector(config, sample_rate):
+    """Double-clap detector described by config, or None if clap_mode is "off" (the default)."""
+    if config.get("clap_mode", "off") == "off":
+        return None
+    return ClapDetector(
+        sample_rate,
+        threshold=config.get("clap_threshold", 3000),
+        sharpness=config.get("clap_sharpness", 4.0),
+        flatness=config.get("clap_flatness", 0.2),
+        max_gap=config.get("clap_max_gap", 0.6),
+    )
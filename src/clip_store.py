@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import wave
+import numpy as np
+
+# Best guess at the benchmark label for a clip, by the event that saved it; meant to be reviewed.
+# Trigger and timeout clips reach back to the wake that preceded them, so they hold the wake phrase too.
+EVENT_KINDS = {"wake": "wake", "trigger": "command", "timeout": "wake"}
+
+
+class ClipRecorder:
+    """Keeps the last few seconds of audio and saves a clip around each detection event.
+
+    The decode loop appends every span (a copy into a preallocated ring) and
+    calls on_event(); once post_seconds more audio has arrived, the clip is
+    cut from the ring and handed to a ClipWriter. Nothing here touches the
+    disk, and a full writer queue drops the clip instead of waiting.
+
+    Events that follow a wake (a trigger or the ACTIVE timeout) pass how long
+    ago it was, and their clip starts pre_seconds before the wake instead, so
+    it holds the wake phrase as well; the ring keeps wake_lookback extra
+    seconds for that.
+    """
+
+    def __init__(self, writer, sample_rate=16000, pre_seconds=3.0, post_seconds=1.0, wake_lookback=5.0):
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.pre = int(pre_seconds * sample_rate)
+        self.post = int(post_seconds * sample_rate)
+        self._ring = np.zeros(self.pre + int(wake_lookback * sample_rate) + self.post, dtype=np.int16)
+        self._written = 0 # Total samples appended so far
+        self._pending = [] # (due sample count, event info)
+        self._heard = [] # Recent recognizer output, saved with the clip
+
+    def append(self, samples):
+        n = len(samples)
+        size = len(self._ring)
+        if n >= size:
+            self._ring[:] = samples[-size:]
+            self._written += n
+            start = 0
+        else:
+            start = self._written % size
+            first = min(n, size - start)
+            self._ring[start:start + first] = samples[:first]
+            self._ring[:n - first] = samples[first:]
+            self._written += n
+        while self._pending and self._pending[0][0] <= self._written:
+            self._cut(self._pending.pop(0)[1])
+
+    def note_result(self, text):
+        self._heard.append(text)
+        del self._heard[:-5]
+
+    def on_event(self, event, text="", wake_ago=None):
+        """Mark an event at the current position; wake_ago is the seconds since the wake it follows, if any."""
+        info = {"event": event, "text": text, "heard": list(self._heard), "time": time.time(),
+                "event_sample": self._written,
+                "wake_sample": None if wake_ago is None else self._written - int(wake_ago * self.sample_rate)}
+        self._pending.append((self._written + self.post, info))
+
+    def flush(self):
+        """Save pending clips with whatever audio followed them (e.g. the stream is pausing)."""
+        while self._pending:
+            self._cut(self._pending.pop(0)[1])
+
+    def _cut(self, info):
+        size = len(self._ring)
+        end = self._written
+        wake = info.pop("wake_sample")
+        first = info["event_sample"] if wake is None else min(wake, info["event_sample"])
+        start = max(first - self.pre, end - size, 0)
+        count = end - start
+        ordered = np.roll(self._ring, -(end % size))[size - count:] # Oldest first
+        info["event_offset"] = (info.pop("event_sample") - start) / self.sample_rate
+        info["wake_offset"] = (wake - start) / self.sample_rate if wake is not None and wake >= start else None
+        self.writer.submit(ordered.copy(), info)
+
+
+class ClipWriter:
+    """Background thread that writes clips and enforces the store's retention limits.
+
+    Clips are 16 kHz mono WAVs. corpus.json in the same directory lists
+    them in the benchmark's manifest format (with the recognizer output
+    alongside), so the directory can be passed to benchmark.py or
+    calibrate.py once the "kind" labels have been checked.
+    """
+
+    def __init__(self, directory, sample_rate=16000, max_files=200, max_mb=100.0, max_age_days=14.0,
+                 queue_size=8):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.saved = 0
+        self.dropped = 0
+        self.thread = None # Started by the first clip
+        self._start_lock = threading.Lock()
+
+    def submit(self, samples, info):
+        if self.thread is None:
+            with self._start_lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="clip-writer", daemon=True)
+                    self.thread.start()
+        try:
+            self.queue.put_nowait((samples, info))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            samples, info = self.queue.get()
+            try:
+                self._write(samples, info)
+                self._enforce_retention()
+            except Exception as e:
+                logging.error(f"Could not save clip: {e}")
+
+    def _write(self, samples, info):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(info["time"]))
+        name = f"{stamp}-{int(info['time'] * 1000) % 1000:03d}-{info['event']}.wav"
+        suffix = 1
+        while os.path.exists(os.path.join(self.directory, name)): # Replays can fire several events per ms
+            name = f"{name[:-4].rsplit('~', 1)[0]}~{suffix}.wav"
+            suffix += 1
+        with wave.open(os.path.join(self.directory, name), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(samples.tobytes())
+
+        kind = EVENT_KINDS.get(info["event"], "noise")
+        if info["event"] != "wake" and info["wake_offset"] is None:
+            kind = "noise" # The wake isn't in the clip (e.g. a clap trigger), so don't expect one
+        entry = {"file": name, "kind": kind, "event": info["event"],
+                 "text": info["text"], "heard": info["heard"], "reviewed": False}
+        # Events fire when the phrase has been recognized, i.e. roughly where it ends
+        if info["event"] == "wake":
+            entry["wake_end"] = round(info["event_offset"], 3)
+        elif info["wake_offset"] is not None:
+            entry["wake_end"] = round(info["wake_offset"], 3)
+        if info["event"] == "trigger":
+            entry["trigger_end"] = round(info["event_offset"], 3)
+        clips = self._load_manifest()
+        clips.append(entry)
+        self._save_manifest(clips)
+        self.saved += 1
+        logging.info(f"Saved {info['event']} clip {name}")
+
+    def _enforce_retention(self):
+        clips = self._load_manifest()
+        now = time.time()
+        kept, total = [], 0
+        # Newest first; anything past a limit goes
+        for entry in reversed(clips):
+            path = os.path.join(self.directory, entry["file"])
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue # Deleted by hand
+            total += stat.st_size
+            if len(kept) >= self.max_files or total > self.max_bytes or now - stat.st_mtime > self.max_age:
+                os.remove(path)
+                continue
+            kept.append(entry)
+        kept.reverse()
+        if len(kept) != len(clips):
+            self._save_manifest(kept)
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, "corpus.json")
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path(), "r") as f:
+                return json.load(f).get("clips", [])
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def _save_manifest(self, clips):
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"clips": clips}, f, indent=4)
+        os.replace(tmp, self._manifest_path())
+
+    def stats(self):
+        return {"saved": self.saved, "dropped": self.dropped, "queued": self.queue.qsize()}
+
+
+def create_clip_recorder(config, sample_rate, writer=None, wake_lookback=5.0):
+    """ClipRecorder described by config, or None if clip_capture is off (the default).
+
+    Several recorders (one per input device) can share one writer.
+    wake_lookback should cover the ACTIVE timeout.
+    """
+    if not config.get("clip_capture", False):
+        return None
+    if writer is None:
+        writer = ClipWriter(
+            config.get("clip_dir", "clips"),
+            sample_rate,
+            max_files=config.get("clip_max_files", 200),
+            max_mb=config.get("clip_max_mb", 100.0),
+            max_age_days=config.get("clip_max_age_days", 14.0),
+        )
+    return ClipRecorder(writer, sample_rate, pre_seconds=config.get("clip_pre_seconds", 3.0),
+                        post_seconds=config.get("clip_post_seconds", 1.0), wake_lookback=wake_lookback)
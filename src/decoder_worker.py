@@ -0,0 +1,188 @@
+import logging
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+try:
+    import cffi
+    _ffi = cffi.FFI()
+except ImportError:
+    _ffi = None
+
+
+def _worker_main(shm_name, ring_bytes, model_path, sample_rate, grammar_str, partials, conn):
+    """Decoder process: reads audio from the shared ring, answers with recognition events."""
+    import vosk
+    vosk.SetLogLevel(-1)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        try:
+            model = vosk.Model(model_path)
+            try:
+                rec = vosk.KaldiRecognizer(model, sample_rate, grammar_str)
+            except Exception:
+                rec = vosk.KaldiRecognizer(model, sample_rate)
+            rec.SetWords(True)
+        except Exception as e:
+            conn.send(("error", str(e)))
+            return
+        conn.send(("ready", None))
+
+        buf = shm.buf
+        while True:
+            msg = conn.recv()
+            op = msg[0]
+            if op == "accept":
+                _, offset, length = msg
+                end = offset + length
+                if end <= ring_bytes:
+                    data = bytes(buf[offset:end])
+                else:
+                    data = bytes(buf[offset:ring_bytes]) + bytes(buf[:end - ring_bytes])
+                # Answer with the event right away so the listener needs one round trip per block
+                if rec.AcceptWaveform(data):
+                    conn.send((True, rec.Result()))
+                else:
+                    conn.send((False, rec.PartialResult() if partials else None))
+            elif op == "final":
+                conn.send(rec.FinalResult())
+            elif op == "partial":
+                conn.send(rec.PartialResult())
+            elif op == "reset":
+                rec.Reset()
+                conn.send(None)
+            elif op == "quit":
+                return
+    except (EOFError, KeyboardInterrupt):
+        pass # Parent went away
+    finally:
+        shm.close()
+
+
+class RemoteRecognizer:
+    """Stand-in for vosk.KaldiRecognizer that decodes in a separate process.
+
+    Audio is copied into a shared-memory ring and only its offset and length
+    travel over the pipe; the worker replies with the recognition result (or
+    partial) for that block. Kaldi and the JSON handling then never compete
+    with the tray/settings UI for the GIL. If the worker dies, or hangs
+    without answering within reply_timeout seconds (plus four times the
+    duration of the audio it was sent), it is killed and respawned; the
+    utterance in flight is lost but the listener keeps running.
+    """
+
+    def __init__(self, model_path, sample_rate, grammar_str=None, partials=False, ring_bytes=256 * 1024,
+                 reply_timeout=1.0):
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.grammar_str = grammar_str
+        self.partials = partials
+        self.ring_bytes = ring_bytes
+        self.reply_timeout = reply_timeout
+        self._shm = shared_memory.SharedMemory(create=True, size=ring_bytes)
+        self._write = 0
+        self._last_result = None
+        self._last_partial = None
+        self._proc = None
+        self._conn = None
+        self.respawns = 0
+        try:
+            self._spawn()
+        except Exception:
+            self._shm.close()
+            self._shm.unlink()
+            raise
+
+    def _spawn(self):
+        ctx = mp.get_context("spawn")
+        parent, child = ctx.Pipe()
+        self._proc = ctx.Process(
+            target=_worker_main,
+            args=(self._shm.name, self.ring_bytes, self.model_path, self.sample_rate,
+                  self.grammar_str, self.partials, child),
+            daemon=True,
+        )
+        self._proc.start()
+        child.close()
+        self._conn = parent
+        status, detail = self._conn.recv() # Blocks until the worker has loaded the model
+        if status != "ready":
+            raise RuntimeError(f"Decoder worker failed to start: {detail}")
+        logging.info(f"Decoder worker started (pid {self._proc.pid}).")
+
+    def _respawn(self, error):
+        logging.error(f"Decoder worker failed ({error}); respawning.")
+        self.respawns += 1
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        if self._proc.is_alive():
+            self._proc.kill()
+        self._proc.join(timeout=1.0)
+        self._spawn()
+
+    def _call(self, msg, default, audio_seconds=0.0):
+        try:
+            self._conn.send(msg)
+            # A hung worker (deadlock, stopped process) would otherwise block the decode thread forever
+            timeout = self.reply_timeout + 4.0 * audio_seconds
+            if not self._conn.poll(timeout):
+                raise TimeoutError(f"no reply within {timeout:.1f}s")
+            return self._conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError, OSError) as e: # TimeoutError is an OSError
+            self._respawn(e)
+            return default
+
+    def AcceptWaveform(self, data):
+        if _ffi is not None and isinstance(data, _ffi.CData):
+            data = _ffi.buffer(data)
+        data = memoryview(data).cast('B')
+        accepted = False
+        # Anything larger than the ring goes over in ring-sized pieces
+        for start in range(0, len(data), self.ring_bytes):
+            accepted = self._accept_chunk(data[start:start + self.ring_bytes]) or accepted
+        return accepted
+
+    def _accept_chunk(self, chunk):
+        n = len(chunk)
+        offset = self._write
+        first = min(n, self.ring_bytes - offset)
+        buf = self._shm.buf
+        buf[offset:offset + first] = chunk[:first]
+        if first < n:
+            buf[:n - first] = chunk[first:]
+        self._write = (offset + n) % self.ring_bytes
+
+        accepted, payload = self._call(("accept", offset, n), (False, None), n / 2 / self.sample_rate)
+        if accepted:
+            self._last_result = payload
+        else:
+            self._last_partial = payload
+        return accepted
+
+    def Result(self):
+        result, self._last_result = self._last_result, None
+        return result or '{"text": ""}'
+
+    def PartialResult(self):
+        if self._last_partial is not None:
+            partial, self._last_partial = self._last_partial, None
+            return partial
+        return self._call(("partial",), '{"partial": ""}')
+
+    def FinalResult(self):
+        return self._call(("final",), '{"text": ""}')
+
+    def Reset(self):
+        self._call(("reset",), None)
+
+    def close(self):
+        try:
+            self._conn.send(("quit",))
+        except Exception:
+            pass
+        self._proc.join(timeout=2.0)
+        if self._proc.is_alive():
+            self._proc.kill()
+        self._shm.close()
+        self._shm.unlink()
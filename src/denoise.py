@@ -0,0 +1,166 @@
+import logging
+import time
+import numpy as np
+
+
+class SpectralDenoiser:
+    """Streaming Wiener-filter noise suppression with 50% overlap-add.
+
+    Audio is cut into frames of `frame` samples (hop = frame / 2) with a
+    square-root Hann window on both analysis and synthesis, so the windows
+    sum to one and clean audio passes through unchanged; up to one hop of
+    input is held back until the next block completes its frame. All frames
+    completed by a block are transformed together in one rfft/irfft call.
+
+    The noise spectrum is tracked from each block's mean power per bin: it
+    follows drops quickly and rises slowly, so steady HVAC or fan noise is
+    learned while short bursts of speech barely move it. Each bin gets the
+    Wiener gain snr / (1 + snr), never below gain_floor, which keeps some
+    noise instead of producing "musical" artefacts.
+
+    Work per sample is fixed, so the cost of a block grows only with its
+    length. If the measured cost goes over max_cpu (CPU seconds per second
+    of audio), the stage bypasses itself rather than starving the decoder.
+    That trip is kept apart from the user's switch (set_enabled), so
+    turning the stage on again in the settings doesn't undo it.
+    """
+
+    def __init__(self, sample_rate=16000, frame=512, gain_floor=0.1, noise_rise=0.002,
+                 noise_fall=0.1, over_subtraction=2.0, max_cpu=0.1, enabled=True):
+        self.sample_rate = sample_rate
+        self.frame = frame
+        self.hop = frame // 2
+        self.gain_floor = gain_floor
+        self.noise_rise = noise_rise  # Per-frame fraction the estimate moves up towards louder minima
+        self.noise_fall = noise_fall  # ... and down towards quieter ones
+        self.over_subtraction = over_subtraction # Treat noise as this much louder, for more suppression
+        self.max_cpu = max_cpu
+        self.enabled = enabled # The user's switch (config "denoise")
+        self.over_budget = False # Tripped by _check_budget; stays off until restart
+
+        n = np.arange(frame)
+        self.window = np.sqrt(0.5 - 0.5 * np.cos(2 * np.pi * n / frame)).astype(np.float32)
+        self.noise = None
+
+        # Streaming state: unprocessed input (always < hop past the last frame) and the pending overlap
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._tail = np.zeros(self.hop, dtype=np.float32)
+        self._out = np.zeros(0, dtype=np.int16)
+
+        # Cost accounting
+        self.blocks = 0
+        self.samples_in = 0
+        self.seconds_spent = 0.0
+        self.max_block_seconds = 0.0
+
+    def process(self, samples):
+        """Denoise one block of int16 samples. Returns int16 samples, valid until the next call."""
+        if self.bypassed:
+            return samples
+        started = time.perf_counter()
+
+        buf = np.concatenate((self._pending, samples.astype(np.float32)))
+        count = (len(buf) - self.hop) // self.hop # Complete frames available
+        if count <= 0:
+            self._pending = buf
+            out = np.zeros(0, dtype=np.int16)
+        else:
+            # frames[i] = buf[i*hop : i*hop + frame], without copying
+            frames = np.lib.stride_tricks.as_strided(
+                buf, shape=(count, self.frame), strides=(buf.strides[0] * self.hop, buf.strides[0]))
+            spectra = np.fft.rfft(frames * self.window, axis=1)
+            power = spectra.real ** 2 + spectra.imag ** 2
+            self._update_noise(power)
+
+            snr = np.maximum(power / (self.over_subtraction * self.noise + 1e-6) - 1.0, 0.0)
+            gain = np.maximum(snr / (1.0 + snr), self.gain_floor)
+            shaped = np.fft.irfft(spectra * gain, n=self.frame, axis=1) * self.window
+
+            # Overlap-add: first half of each frame plus second half of the previous one
+            halves = shaped[:, :self.hop].copy()
+            halves[0] += self._tail
+            halves[1:] += shaped[:-1, self.hop:]
+            self._tail = shaped[-1, self.hop:].copy()
+            self._pending = buf[count * self.hop:]
+
+            flat = halves.ravel()
+            np.clip(np.rint(flat, out=flat), -32768, 32767, out=flat)
+            if len(self._out) < flat.size:
+                self._out = np.empty(flat.size, dtype=np.int16)
+            out = self._out[:flat.size]
+            out[:] = flat
+
+        elapsed = time.perf_counter() - started
+        self.blocks += 1
+        self.samples_in += len(samples)
+        self.seconds_spent += elapsed
+        self.max_block_seconds = max(self.max_block_seconds, elapsed)
+        self._check_budget()
+        return out
+
+    def _update_noise(self, power):
+        level = power.mean(axis=0)
+        if self.noise is None:
+            self.noise = level
+            return
+        rate = np.where(level < self.noise, self.noise_fall, self.noise_rise)
+        # Frames in the block count as that many update steps
+        rate = 1.0 - (1.0 - rate) ** len(power)
+        self.noise += rate * (level - self.noise)
+
+    def _check_budget(self):
+        # Judge on at least a second of audio so one slow block (e.g. a GC pause) doesn't trip it
+        if self.max_cpu and self.samples_in >= self.sample_rate:
+            cost = self.cost_per_second()
+            if cost > self.max_cpu:
+                logging.warning(f"Denoiser uses {cost:.3f} CPU-s per audio-second "
+                                f"(limit {self.max_cpu}); bypassing it.")
+                self.over_budget = True
+                self.reset()
+
+    @property
+    def bypassed(self):
+        return not self.enabled or self.over_budget
+
+    def set_enabled(self, enabled):
+        if enabled != self.enabled:
+            self.enabled = enabled
+            self.reset()
+
+    def reset(self):
+        """Forget stream state (between streams); the noise estimate is kept."""
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._tail[:] = 0
+
+    def cost_per_second(self):
+        """CPU seconds spent per second of input audio."""
+        if not self.samples_in:
+            return None
+        return self.seconds_spent / (self.samples_in / self.sample_rate)
+
+    def stats(self):
+        return {
+            "bypassed": self.bypassed,
+            "enabled": self.enabled,
+            "over_budget": self.over_budget,
+            "blocks": self.blocks,
+            "mean_block_ms": 1000.0 * self.seconds_spent / self.blocks if self.blocks else None,
+            "max_block_ms": 1000.0 * self.max_block_seconds,
+            "cpu_seconds": self.seconds_spent,
+            "cost_per_second": self.cost_per_second(),
+        }
+
+
+def create_denoiser(config, sample_rate):
+    """Build the denoise stage described by config; "denoise" (off by default) only sets its bypass.
+
+    The stage always exists so a settings reload can switch it on without a restart.
+    """
+    frame = int(sample_rate * config.get("denoise_frame_ms", 32) / 1000)
+    return SpectralDenoiser(
+        sample_rate,
+        frame=frame - frame % 2,
+        gain_floor=config.get("denoise_gain_floor", 0.1),
+        max_cpu=config.get("denoise_max_cpu", 0.1),
+        enabled=config.get("denoise", False),
+    )
@@ -0,0 +1,195 @@
+"""Enroll a custom wake phrase from a few recordings of the user saying it.
+
+Records --samples takes of the phrase from the microphone, trims the
+silence around each, and stores their MFCCs as compact templates
+(wake_templates.npz, next to the config file). The config is then switched
+to the template spotter (see kws.py): the phrase becomes wake_phrase, and
+with kws_confirm off a template match wakes the listener on its own, so the
+phrase doesn't have to be in the Vosk model's vocabulary. kws_threshold is
+set by streaming each recorded take, silence and all, through a live
+spotter built from the other takes, so it is scored exactly as the
+listener would score it.
+
+The same flow is available from the tray menu ("Enroll Wake Phrase").
+
+Usage: python src/enroll.py "hey jarvis" [--samples 5] [--seconds 2.5] [--device N] [--config config.json]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+from audio_source import MicrophoneSource
+from features import FeatureExtractor
+from kws import KeywordSpotter, save_templates
+from resampler import PolyphaseResampler
+
+TEMPLATE_FILE = "wake_templates.npz"
+
+
+def record(seconds, sample_rate=16000, device=None):
+    """Record `seconds` of int16 audio at sample_rate, capturing at the device's native rate."""
+    source = MicrophoneSource(sample_rate, device=device)
+    capture_rate = source.resolve_capture_rate()
+    chunks = []
+    done = threading.Event()
+    needed = int(seconds * capture_rate)
+
+    def callback(indata, frames, time_info, status):
+        chunks.append(np.frombuffer(indata, dtype=np.int16).copy())
+        if sum(len(c) for c in chunks) >= needed:
+            done.set()
+
+    with source.open(callback):
+        done.wait(seconds + 2.0)
+    audio = np.concatenate(chunks)[:needed] if chunks else np.zeros(0, dtype=np.int16)
+    if capture_rate != sample_rate:
+        audio = np.clip(PolyphaseResampler(capture_rate, sample_rate).process(audio), -32768, 32767).astype(np.int16)
+    return audio
+
+
+def trim_silence(samples, sample_rate=16000, margin_ms=100, min_ms=250):
+    """The speech part of a take (10 ms frames well above the take's quietest level), or None."""
+    frame = sample_rate // 100
+    n = len(samples) // frame
+    if n == 0:
+        return None
+    frames = samples[:n * frame].astype(np.float32).reshape(n, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    floor = np.percentile(rms, 10)
+    active = np.flatnonzero(rms > max(floor * 4.0, rms.max() * 0.1, 200.0))
+    if len(active) == 0:
+        return None
+    margin = margin_ms // 10
+    start = max(0, active[0] - margin)
+    end = min(n, active[-1] + 1 + margin)
+    if (end - start) * 10 < min_ms:
+        return None
+    return samples[start * frame:end * frame]
+
+
+def take_distances(templates, recordings, sample_rate=16000, block_ms=40):
+    """Best live-spotter distance of each recording against the templates of the other takes.
+
+    The whole recording (with the silence around the phrase) is fed in
+    capture-sized blocks through a FeatureExtractor and KeywordSpotter,
+    as the listener would.
+    """
+    block = int(sample_rate * block_ms / 1000)
+    distances = []
+    for i, audio in enumerate(recordings):
+        extractor = FeatureExtractor(sample_rate)
+        spotter = KeywordSpotter(templates[:i] + templates[i + 1:], sample_rate, threshold=-1.0) # Never fires
+        for start in range(0, len(audio), block):
+            samples = audio[start:start + block]
+            spotter.process(samples, extractor.process(samples)[1])
+        if spotter.best_distance is not None:
+            distances.append(spotter.best_distance)
+    return distances
+
+
+def suggest_threshold(distances):
+    """Loose enough to accept every take against the others, with some margin, within sane bounds.
+
+    Above about 0.3 other phrases start to match.
+    """
+    return float(min(0.3, max(0.12, max(distances) * 1.5)))
+
+
+def matching_cost(templates, sample_rate=16000, seconds=5.0):
+    """Stage-1 CPU seconds per audio-second with these templates, on noise."""
+    extractor = FeatureExtractor(sample_rate)
+    spotter = KeywordSpotter(templates, sample_rate, threshold=-1.0) # Never fires, so it keeps matching
+    audio = np.random.default_rng(0).normal(0, 500, int(sample_rate * seconds)).astype(np.int16)
+    block = sample_rate // 25
+    for start in range(0, len(audio), block):
+        samples = audio[start:start + block]
+        spotter.process(samples, extractor.process(samples)[1])
+    return (spotter.cpu_seconds + extractor.cpu_seconds) / seconds
+
+
+def enroll(phrase, config_path="config.json", samples=5, seconds=2.5, device=None, report=print):
+    """Record and store templates for `phrase` and switch the config to them. Returns a summary dict.
+
+    report(message) is called with progress messages, e.g. to show them in a window.
+    """
+    sample_rate = 16000
+    templates = []
+    recordings = []
+    attempts = 0
+    while len(templates) < samples and attempts < samples * 2:
+        attempts += 1
+        report(f"Say '{phrase}' now ({len(templates) + 1}/{samples})")
+        time.sleep(0.3) # Give the prompt a moment to show before recording
+        audio = record(seconds, sample_rate, device)
+        take = trim_silence(audio, sample_rate)
+        if take is None:
+            report("Didn't catch that, let's try again.")
+            continue
+        templates.append(FeatureExtractor(sample_rate).process(take)[1].copy())
+        recordings.append(audio)
+    if len(templates) < 2:
+        raise RuntimeError("Not enough usable recordings; check the microphone and try again.")
+
+    distances = take_distances(templates, recordings, sample_rate)
+    if not distances:
+        raise RuntimeError("The recordings were too short to compare; try a longer --seconds.")
+    threshold = suggest_threshold(distances)
+    template_path = os.path.join(os.path.dirname(os.path.abspath(config_path)), TEMPLATE_FILE)
+    save_templates(template_path, phrase, templates, sample_rate)
+
+    try:
+        with open(config_path, "r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    # The app runs from the config's directory, so a bare file name is enough there
+    in_cwd = os.path.dirname(template_path) == os.getcwd()
+    config.update(wake_phrase=phrase, kws_cascade=True, kws_confirm=False,
+                  kws_template_file=TEMPLATE_FILE if in_cwd else template_path, kws_threshold=round(threshold, 3))
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=4)
+
+    summary = {
+        "phrase": phrase,
+        "templates": len(templates),
+        "template_file": template_path,
+        "template_bytes": os.path.getsize(template_path),
+        "max_take_distance": max(distances),
+        "threshold": threshold,
+        "cpu_seconds_per_audio_second": matching_cost(templates, sample_rate),
+    }
+    report(f"Enrolled '{phrase}' from {summary['templates']} takes "
+           f"({summary['template_bytes'] / 1024:.1f} KB, threshold {threshold:.3f}, "
+           f"matching {summary['cpu_seconds_per_audio_second'] * 1000:.2f} ms per audio-second).")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll a custom wake phrase from recordings.")
+    parser.add_argument("phrase", help="The wake phrase, e.g. \"hey jarvis\"")
+    parser.add_argument("--samples", type=int, default=5, help="Number of takes to record")
+    parser.add_argument("--seconds", type=float, default=2.5, help="Recording length per take")
+    parser.add_argument("--device", help="Input device index or name (default: config input_device)")
+    parser.add_argument("--config", default="config.json", help="Config file to update")
+    args = parser.parse_args()
+
+    device = args.device
+    if device is None and os.path.exists(args.config):
+        with open(args.config, "r") as f:
+            device = json.load(f).get("input_device")
+    elif device is not None and device.isdigit():
+        device = int(device)
+
+    try:
+        enroll(args.phrase.lower(), args.config, args.samples, args.seconds, device)
+    except Exception as e: # No microphone, PortAudio errors, ...
+        print(f"Enrollment failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
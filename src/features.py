@@ -0,0 +1,131 @@
+import time
+import numpy as np
+
+
+def mel_filterbank(sample_rate, n_fft, n_mels, fmin=20.0, fmax=None):
+    """(n_fft // 2 + 1, n_mels) matrix of triangular mel filters, for power @ bank."""
+    fmax = fmax or sample_rate / 2
+    mel = lambda f: 2595.0 * np.log10(1.0 + f / 700.0)
+    hz = lambda m: 700.0 * (10 ** (m / 2595.0) - 1.0)
+    edges = hz(np.linspace(mel(fmin), mel(fmax), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins[None, :] - lower) / (center - lower)
+    falling = (upper - bins[None, :]) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).T.astype(np.float32)
+
+
+def dct_matrix(n_mels, n_ceps):
+    """(n_mels, n_ceps) orthonormal DCT-II, for log_mel @ dct."""
+    n = np.arange(n_mels)
+    k = np.arange(n_ceps)
+    dct = np.cos(np.pi / n_mels * (n[:, None] + 0.5) * k[None, :]) * np.sqrt(2.0 / n_mels)
+    dct[:, 0] /= np.sqrt(2.0)
+    return dct.astype(np.float32)
+
+
+class FeatureExtractor:
+    """Streaming log-mel and MFCC features of the captured audio.
+
+    Frames are frame_ms long every hop_ms. All frames completed by a block
+    go through one batch rfft and two matrix products (mel filterbank, DCT),
+    and samples that don't complete a frame wait for the next block, so the
+    frames don't depend on how the audio was chunked.
+
+    The window, filterbank and DCT matrices are built once, and the frame,
+    power and feature buffers are reused from block to block (they only
+    grow if a longer block arrives). So process() returns views that are
+    valid until the next call; copy anything you keep.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=25, hop_ms=10, n_mels=40, n_ceps=13):
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.hop = int(sample_rate * hop_ms / 1000)
+        self.frame_rate = sample_rate / self.hop # Feature frames per second
+        self.n_fft = 1 << (self.frame - 1).bit_length()
+        self.n_mels = n_mels
+        self.n_ceps = n_ceps
+        self.window = np.hamming(self.frame).astype(np.float32)
+        self.bank = mel_filterbank(sample_rate, self.n_fft, n_mels)
+        self.dct = dct_matrix(n_mels, n_ceps)
+
+        self._pending = 0 # Samples at the start of _buf still waiting for a full frame
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._frames = np.zeros((0, self.n_fft), dtype=np.float32) # Zero-padded past self.frame
+        self._power = np.zeros((0, self.n_fft // 2 + 1), dtype=np.float32)
+        self._log_mel = np.zeros((0, n_mels), dtype=np.float32)
+        self._mfcc = np.zeros((0, n_ceps), dtype=np.float32)
+
+        # Cost accounting
+        self.frames_out = 0
+        self.samples_in = 0
+        self.cpu_seconds = 0.0
+
+    def _reserve(self, samples, frames):
+        if len(self._buf) < samples:
+            buf = np.empty(samples, dtype=np.float32)
+            buf[:self._pending] = self._buf[:self._pending]
+            self._buf = buf
+        if len(self._frames) < frames:
+            self._frames = np.zeros((frames, self.n_fft), dtype=np.float32)
+            self._power = np.empty((frames, self.n_fft // 2 + 1), dtype=np.float32)
+            self._log_mel = np.empty((frames, self.n_mels), dtype=np.float32)
+            self._mfcc = np.empty((frames, self.n_ceps), dtype=np.float32)
+
+    def process(self, samples):
+        """Features of the frames completed by this block: (log_mel, mfcc), each (frames, n)."""
+        started = time.thread_time()
+        total = self._pending + len(samples)
+        count = (total - self.frame) // self.hop + 1 if total >= self.frame else 0
+        self._reserve(total, count)
+        buf = self._buf[:total]
+        buf[self._pending:] = samples
+        self.samples_in += len(samples)
+
+        if count > 0:
+            # frames[i] = buf[i*hop : i*hop + frame], without copying
+            strided = np.lib.stride_tricks.as_strided(
+                buf, shape=(count, self.frame), strides=(buf.strides[0] * self.hop, buf.strides[0]))
+            frames = self._frames[:count]
+            np.multiply(strided, self.window, out=frames[:, :self.frame])
+            spectra = np.fft.rfft(frames, axis=1)
+            power = self._power[:count]
+            np.square(spectra.real, out=power)
+            power += np.square(spectra.imag)
+            log_mel = np.matmul(power, self.bank, out=self._log_mel[:count])
+            log_mel += 1e-3
+            np.log(log_mel, out=log_mel)
+            mfcc = np.matmul(log_mel, self.dct, out=self._mfcc[:count])
+            consumed = count * self.hop
+            buf[:total - consumed] = buf[consumed:] # Keep the partial frame at the front
+            self._pending = total - consumed
+        else:
+            log_mel = self._log_mel[:0]
+            mfcc = self._mfcc[:0]
+            self._pending = total
+
+        self.frames_out += count
+        self.cpu_seconds += time.thread_time() - started
+        return log_mel, mfcc
+
+    def reset(self):
+        self._pending = 0
+
+    def stats(self):
+        return {
+            "frames": self.frames_out,
+            "cpu_seconds": self.cpu_seconds,
+            "frames_per_cpu_second": self.frames_out / self.cpu_seconds if self.cpu_seconds else None,
+            "cost_per_second": self.cpu_seconds / (self.samples_in / self.sample_rate) if self.samples_in else None,
+        }
+
+
+def measure_throughput(sample_rate=16000, seconds=10.0, block_ms=40):
+    """Feature frames computed per CPU-second on this thread (one core), for noise in capture-sized blocks."""
+    extractor = FeatureExtractor(sample_rate)
+    block = int(sample_rate * block_ms / 1000)
+    audio = (np.random.default_rng(0).normal(0, 3000, int(sample_rate * seconds))).astype(np.int16)
+    for start in range(0, len(audio), block):
+        extractor.process(audio[start:start + block])
+    return extractor.stats()["frames_per_cpu_second"]
@@ -200,3 +200,55 @@ class SettingsWindow(ctk.CTkToplevel):
 
     def destroy_window(self):
         self.destroy()
+
+
+class EnrollWindow(ctk.CTkToplevel):
+    """Records a few takes of a custom wake phrase (see enroll.py)."""
+
+    def __init__(self, parent, config_path, on_close_callback):
+        super().__init__(parent)
+        self.title("Spoken_Shortcuts - Enroll Wake Phrase")
+        self.geometry("460x220")
+        self.config_path = config_path
+        self.on_close_callback = on_close_callback
+        self.enrolled = False
+
+        self.lift()
+        self.attributes("-topmost", True)
+        self.after(100, lambda: self.attributes("-topmost", False))
+
+        self.entry_phrase = ctk.CTkEntry(self, placeholder_text="Wake phrase, e.g. hey jarvis", width=300)
+        self.entry_phrase.pack(pady=(20, 10))
+
+        self.lbl_status = ctk.CTkLabel(self, text="You'll be asked to say the phrase 5 times.", wraplength=420)
+        self.lbl_status.pack(pady=10)
+
+        self.btn_start = ctk.CTkButton(self, text="Start Recording", command=self.start)
+        self.btn_start.pack(pady=10)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def start(self):
+        phrase = " ".join(self.entry_phrase.get().lower().split())
+        if not phrase:
+            self.lbl_status.configure(text="Type the phrase first.")
+            return
+        self.btn_start.configure(state="disabled")
+        self.entry_phrase.configure(state="disabled")
+        threading.Thread(target=self.run_enroll, args=(phrase,), daemon=True).start()
+
+    def report(self, message):
+        self.after(0, lambda: self.lbl_status.configure(text=message))
+
+    def run_enroll(self, phrase):
+        from enroll import enroll
+        try:
+            enroll(phrase, self.config_path, report=self.report)
+            self.enrolled = True
+        except Exception as e:
+            self.report(f"Enrollment failed: {e}")
+        self.after(0, lambda: self.btn_start.configure(state="normal", text="Close", command=self.close))
+
+    def close(self):
+        if self.on_close_callback:
+            self.on_close_callback(self.enrolled)
+        self.destroy()
@@ -0,0 +1,97 @@
+import json
+
+
+class PhraseTable:
+    """Word-level trie mapping spoken phrases to values.
+
+    match() scans the recognized text once and walks the trie from each word,
+    so its cost depends on the length of the text and the longest phrase, not
+    on how many phrases are registered. Matching is by whole words, so "hey"
+    does not fire on "they".
+    """
+
+    _END = object()  # Key marking "a phrase ends here" inside a trie node
+
+    def __init__(self):
+        self._root = {}
+        self.phrases = {}
+
+    def add(self, phrase, value):
+        phrase = " ".join(phrase.lower().split())
+        if not phrase:
+            return
+        node = self._root
+        for word in phrase.split():
+            node = node.setdefault(word, {})
+        node[self._END] = phrase
+        self.phrases[phrase] = value
+
+    def match(self, text):
+        """Return (phrase, value) for the leftmost-longest phrase in text, or None."""
+        words = text.split()
+        for start in range(len(words)):
+            node = self._root
+            best = None
+            for word in words[start:]:
+                node = node.get(word)
+                if node is None:
+                    break
+                if self._END in node:
+                    best = node[self._END]
+            if best is not None:
+                return best, self.phrases[best]
+        return None
+
+    def __contains__(self, phrase):
+        return phrase in self.phrases
+
+    def __len__(self):
+        return len(self.phrases)
+
+
+# Action value for the legacy trigger_phrase: launch the configured "apps" list
+LAUNCH_ALL = "launch_all"
+
+
+def build_command_table(config):
+    """Commands available while ACTIVE.
+
+    config["commands"] maps phrases to action lists, e.g.
+        {"open work": ["outlook.exe", "ms-teams.exe"], "lock": ["cmd:rundll32.exe user32.dll,LockWorkStation"]}
+    The legacy trigger_phrase stays mapped to the "apps" list.
+    """
+    table = PhraseTable()
+    trigger_phrase = config.get("trigger_phrase", "open")
+    if trigger_phrase:
+        table.add(trigger_phrase, LAUNCH_ALL)
+    for phrase, actions in config.get("commands", {}).items():
+        if isinstance(actions, str):
+            actions = [actions]
+        table.add(phrase, list(actions))
+    return table
+
+
+def phrase_confidence(phrase, words):
+    """Confidence of phrase in a Vosk word list (SetWords output).
+
+    A phrase is as confident as its least confident word; if it occurs more
+    than once the best occurrence counts. Returns 0.0 if it does not occur.
+    """
+    target = phrase.split()
+    spoken = [w.get("word") for w in words]
+    best = 0.0
+    for start in range(len(spoken) - len(target) + 1):
+        if spoken[start:start + len(target)] == target:
+            best = max(best, min(w.get("conf", 1.0) for w in words[start:start + len(target)]))
+    return best
+
+
+def build_grammar(*tables):
+    """One Vosk grammar (JSON string) covering every phrase in the given tables."""
+    phrases = []
+    for table in tables:
+        for phrase in table.phrases:
+            if phrase not in phrases:
+                phrases.append(phrase)
+    phrases.append("[unk]")
+    return json.dumps(phrases)
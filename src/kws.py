@@ -0,0 +1,204 @@
+import glob
+import logging
+import os
+import time
+import numpy as np
+from audio_source import FileSource
+from features import FeatureExtractor
+from resampler import PolyphaseResampler
+
+
+def normalize_features(features):
+    """Drop c0 (loudness) and scale rows to unit length, so a dot product is cosine similarity."""
+    features = features[:, 1:]
+    return features / (np.linalg.norm(features, axis=1, keepdims=True) + 1e-6)
+
+
+def dtw_end_distance(template, window, slack=5):
+    """Mean cosine distance of the best alignment of `template` ending near the end of `window`.
+
+    Both are normalized feature sequences (frames x dims). The alignment
+    must end within `slack` frames of the window's last frame and may start
+    anywhere. Steps are (1,1), (1,2) and (2,1), which bounds warping to a
+    factor of two and lets each template frame be computed as one vector
+    operation over the whole window.
+    """
+    # Run backwards from the end so "ends near the last frame" is the DTW start
+    cost = 1.0 - template[::-1] @ window[::-1].T # (T, W)
+    T, W = cost.shape
+    inf = np.float32(np.inf)
+    prev2 = np.full(W + 2, inf, dtype=np.float32) # Rows are padded by 2 on the left for the shifts
+    prev = np.full(W + 2, inf, dtype=np.float32)
+    prev[2:2 + slack] = cost[0, :slack]
+    for i in range(1, T):
+        row = np.full(W + 2, inf, dtype=np.float32)
+        best = np.minimum(np.minimum(prev[1:W + 1], prev[:W]), prev2[1:W + 1])
+        row[2:] = cost[i] + best
+        prev2, prev = prev, row
+    return float(prev[2:].min()) / T
+
+
+class KeywordSpotter:
+    """First stage of the wake cascade: MFCC + DTW against enrolled recordings of the wake phrase.
+
+    process() takes every block while the listener is IDLE, with its MFCCs
+    from the listener's FeatureExtractor, and returns True when the last
+    audio looks like one of the templates. Matching runs every
+    check_ms, against the newest features only, so its cost doesn't grow
+    with uptime. Enough audio to cover the longest match is kept, so the
+    second stage (Vosk) can decode the candidate without having heard it live.
+
+    Each template has its own mean removed (cepstral mean normalization), and
+    so does the window it is matched against, so the channel and room level
+    cancel out the same way on both sides.
+    """
+
+    def __init__(self, templates, sample_rate=16000, frame_rate=100, threshold=0.2, check_ms=100):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.check_every = max(1, int(check_ms * frame_rate / 1000))
+        templates = [np.asarray(t, dtype=np.float32) for t in templates]
+        self.templates = [normalize_features(t - t.mean(axis=0)) for t in templates]
+        longest = max(len(t) for t in self.templates)
+        self.history = np.zeros((0, templates[0].shape[1]), dtype=np.float32) # Raw MFCCs of the newest frames
+        self.max_frames = 2 * longest # Up to 2x slower than the slowest template (the DTW slope limit)
+        self._since_check = 0
+
+        # Rolling audio for the second stage
+        self.audio = np.zeros(int(sample_rate * (self.max_frames / frame_rate + 0.3)), dtype=np.int16)
+
+        # Counters
+        self.blocks = 0
+        self.checks = 0
+        self.hits = 0
+        self.confirmed = 0 # Hits the second stage agreed with (set by the listener)
+        self.best_distance = None
+        self.cpu_seconds = 0.0 # Stage 1 matching (feature extraction is counted by the FeatureExtractor)
+        self.decoder_cpu_seconds = 0.0 # Stage 2, added by the listener
+        self.audio_seconds = 0.0
+
+    def process(self, samples, features, match=True):
+        """Feed one block and its MFCCs; True if it completed a match. match=False skips matching (e.g. silence)."""
+        started = time.thread_time()
+        n = len(samples)
+        self.blocks += 1
+        self.audio_seconds += n / self.sample_rate
+        if n >= len(self.audio):
+            self.audio[:] = samples[-len(self.audio):]
+        else:
+            self.audio[:-n] = self.audio[n:]
+            self.audio[-n:] = samples
+
+        hit = False
+        if len(features):
+            self.history = np.concatenate((self.history, features))[-self.max_frames:]
+            self._since_check += len(features)
+            if match and self._since_check >= self.check_every and len(self.history) >= self.max_frames // 4:
+                self._since_check = 0
+                hit = self._match()
+        self.cpu_seconds += time.thread_time() - started
+        return hit
+
+    def _match(self):
+        self.checks += 1
+        window = normalize_features(self.history - self.history.mean(axis=0))
+        distance = min(dtw_end_distance(t, window) for t in self.templates)
+        if self.best_distance is None or distance < self.best_distance:
+            self.best_distance = distance
+        if distance > self.threshold:
+            return False
+        self.hits += 1
+        self.history = self.history[:0] # Don't fire again on the same audio
+        return True
+
+    def window(self):
+        """The buffered audio for the second stage to decode."""
+        return self.audio
+
+    def reset(self):
+        """Forget stream state (between streams)."""
+        self.history = self.history[:0]
+        self.audio[:] = 0
+        self._since_check = 0
+
+    def stats(self):
+        return {
+            "templates": len(self.templates),
+            "checks": self.checks,
+            "hits": self.hits,
+            "confirmed": self.confirmed,
+            "hit_rate_per_hour": self.hits / self.audio_seconds * 3600 if self.audio_seconds else None,
+            "best_distance": self.best_distance,
+            "stage1_cpu_seconds": self.cpu_seconds,
+            "stage2_cpu_seconds": self.decoder_cpu_seconds,
+        }
+
+
+def load_template(path, sample_rate=16000):
+    """MFCCs of one enrolled WAV (any rate; resampled like a native-rate microphone)."""
+    source = FileSource(path, sample_rate)
+    samples = source.samples
+    if source.capture_rate != sample_rate:
+        samples = PolyphaseResampler(source.capture_rate, sample_rate).process(samples)
+    return FeatureExtractor(sample_rate).process(samples)[1].copy()
+
+
+def save_templates(path, phrase, templates, sample_rate=16000):
+    """Store enrolled MFCC sequences compactly (float16, one .npz, a few KB per sample)."""
+    arrays = {f"t{i}": np.asarray(t, dtype=np.float16) for i, t in enumerate(templates)}
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, phrase=np.array(phrase), sample_rate=np.array(sample_rate), **arrays)
+    os.replace(tmp, path)
+
+
+def load_templates(path, sample_rate=16000):
+    """(phrase, templates) from save_templates(). Templates are only valid at the rate they were made at."""
+    with np.load(path) as data:
+        if int(data["sample_rate"]) != sample_rate:
+            raise ValueError(f"{path} was enrolled at {int(data['sample_rate'])} Hz, not {sample_rate} Hz")
+        count = sum(1 for key in data.files if key.startswith("t"))
+        return str(data["phrase"]), [data[f"t{i}"].astype(np.float32) for i in range(count)]
+
+
+def create_keyword_spotter(config, sample_rate):
+    """Stage-1 wake spotter described by config, or None if the cascade is off or has no templates.
+
+    Templates come from kws_template_file (written by enroll.py) if it
+    exists, otherwise from the WAVs in kws_templates or kws_template_dir.
+    """
+    if not config.get("kws_cascade", False):
+        return None
+    template_file = config.get("kws_template_file", "wake_templates.npz")
+    if os.path.exists(template_file):
+        try:
+            phrase, templates = load_templates(template_file, sample_rate)
+            logging.info(f"Loaded {len(templates)} enrolled template(s) for '{phrase}' from {template_file}")
+            return _spotter(config, sample_rate, templates)
+        except Exception as e:
+            logging.warning(f"Could not load wake templates from {template_file}: {e}")
+    paths = config.get("kws_templates")
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(config.get("kws_template_dir", "wake_templates"), "*.wav")))
+    templates = []
+    for path in paths:
+        try:
+            features = load_template(path, sample_rate)
+        except Exception as e:
+            logging.warning(f"Skipping wake template {path}: {e}")
+            continue
+        if len(features) >= 10:
+            templates.append(features)
+    return _spotter(config, sample_rate, templates)
+
+
+def _spotter(config, sample_rate, templates):
+    if not templates:
+        logging.warning("kws_cascade is on but no usable wake templates were found; decoding everything.")
+        return None
+    logging.info(f"Wake cascade: {len(templates)} template(s), threshold {config.get('kws_threshold', 0.2)}")
+    return KeywordSpotter(
+        templates,
+        sample_rate,
+        threshold=config.get("kws_threshold", 0.2),
+        check_ms=config.get("kws_check_ms", 100),
+    )
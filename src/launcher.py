@@ -11,6 +11,19 @@ class AppLauncher:
         for app in self.apps:
             self.launch_app(app)
 
+    def run_actions(self, actions):
+        """Runs a command's action list. Entries are app paths/AUMIDs, or 'cmd:<command line>'."""
+        for action in actions:
+            if action.startswith("cmd:"):
+                command = action[len("cmd:"):].strip()
+                print(f"Running: {command}")
+                try:
+                    subprocess.Popen(command, shell=True)
+                except Exception as e:
+                    print(f"Failed to run {command}: {e}")
+            else:
+                self.launch_app(action)
+
     def launch_app(self, path):
         """Launches a single app by path or AUMID"""
         print(f"Launching: {path}")
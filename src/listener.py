@@ -1,128 +1,627 @@
 import json
-import queue
 import sys
-import sounddevice as sd
 import vosk
 import numpy as np
 import time
 import logging
+import threading
+from audio_source import capture_settings, create_audio_source
+from backoff import Backoff
+from clap import create_clap_detector
+from clip_store import create_clip_recorder
+from denoise import create_denoiser
+from metrics import ListenerMetrics
+from resampler import BlockResampler
+from features import FeatureExtractor
+from kws import create_keyword_spotter
+from intents import LAUNCH_ALL, PhraseTable, build_command_table, build_grammar, phrase_confidence
+from ring_buffer import AudioRingBuffer
+from timers import TimerScheduler
+from vad import VoiceGate, create_voice_gate
 
 class AudioListener:
-    def __init__(self, config, launcher):
+    def __init__(self, config, launcher, source=None, model=None, defer_load=False):
         self.config = config
         self.launcher = launcher
         self.running = False
         self.paused = False
         self.state = "IDLE"  # IDLE, ACTIVE (Listening for claps)
         self.on_state_change = None # Callback for state changes
+        self.on_detection = None # Callback(event, text) for "wake", "trigger" and "timeout"
         
-        self.model_path = "model"
-        try:
-            logging.info(f"Loading Vosk model from {self.model_path}...")
-            self.model = vosk.Model(self.model_path)
-            logging.info("Model loaded successfully.")
-        except Exception as e:
-            logging.critical(f"Failed to load model from {self.model_path}: {e}")
-            print(f"Failed to load model from {self.model_path}: {e}")
-            sys.exit(1)
-            
-        self.wake_phrase = config.get("wake_phrase", "wake up").lower()
-        self.trigger_phrase = config.get("trigger_phrase", "open").lower()
+        self.model_path = config.get("model_path", "model")
+        self.model = model # May already be loaded by the caller (e.g. shared across benchmark runs)
+        self.rec = None
+        self.ready = threading.Event() # Set once the model and recognizer are loaded
+        # Decode in a separate process so UI/COM work in this one can't delay detections
+        self.decoder_process = config.get("decoder_process", False)
+
+        self._apply_phrases(self._build_phrases(config))
         self.active_timeout = 5.0 # Seconds to wait for command
         self.last_wake_time = 0
 
+        # Deadlines (the ACTIVE timeout) fire from a monotonic-clock timer thread, not when audio arrives
+        self.timers = TimerScheduler()
+        self._timeout_timer = None
+        self._state_lock = threading.RLock() # State machine is driven by the decode loop and by timers
+
+        # Early detection: act on partial results instead of waiting for Vosk to end the utterance
+        self.early_detection = config.get("early_detection", False)
+        self.early_partials = config.get("early_detection_partials", 2) # Consecutive partials required
+        self._partial_hits = 0
+        self._early_fired = set() # Events already fired from partials in the current utterance
+
+        # Hot-swap: a recognizer built in the background waits here until the decode loop picks it up
+        self._pending_swap = None
+        self._reload_generation = 0
+        self._swap_lock = threading.Lock()
+
+        # Block size, device latency and queue depth come from the capture profile
+        self.capture = capture_settings(config)
+        self.sample_rate = self.capture["sample_rate"]
+        self.blocksize = self.capture["blocksize"]
+        self.idle_batch = self.capture["idle_batch"]
+        logging.info(f"Capture profile '{self.capture['profile']}': {self.blocksize} frames/block, "
+                     f"{self.idle_batch} block(s) per decode while IDLE, latency={self.capture['device_latency']}")
+
+        # Preallocated block ring shared with the audio callback (replaces an unbounded queue)
+        self.audio_buffer = AudioRingBuffer(self.blocksize, self.capture["buffer_blocks"])
+
+        # Where audio comes from: the microphone by default, or a replay source for offline runs
+        self.source = source or create_audio_source(config, self.capture)
+        if self.source.lossless:
+            self.source.blocksize = self.blocksize # Replay sources re-chunk to whatever the profile uses
+        self.resampler = None # Set up by prepare_stream when the source's capture rate differs from the model's
+        self.samples_processed = 0 # Audio consumed so far, used as the clock for replay sources
+
+        # Retry delays for stream errors (e.g. device unplugged): short at first, capped at a few seconds
+        self.stream_backoff = Backoff(initial=0.1, max_delay=config.get("stream_retry_max", 5.0))
+
+        # Voice activity gate: skip decoding while the room is silent (None = decode everything)
+        self.vad = create_voice_gate(config, self.sample_rate)
+        # Optional noise suppression between the VAD and the recognizer (bypassed unless "denoise" is on)
+        self.denoiser = create_denoiser(config, self.sample_rate)
+        # Optional wake cascade: while IDLE a cheap MFCC/DTW spotter listens and Vosk only checks its hits
+        self.kws = None
+        # Spectral features of the captured audio, computed once per span for whichever stages use them
+        self.features = None
+        self.set_spotter(create_keyword_spotter(config, self.sample_rate))
+        # Off for enrolled phrases the model may not know: a spotter hit is then the wake on its own
+        self.kws_confirm = config.get("kws_confirm", True)
+        # Optional double-clap trigger, detected without the recognizer (clap_mode "wake" or "command")
+        self.clap = create_clap_detector(config, self.sample_rate)
+        self.clap_mode = config.get("clap_mode", "off")
+        self.clap_only = config.get("clap_only", False) # Claps are the only trigger; never decode speech
+        self._decoder_engaged = False # Vosk has been fed since the cascade last took over
+
+        # Hot-path timers and counters; a summary line is logged every metrics_interval seconds
+        self.metrics = ListenerMetrics(config.get("metrics_interval", 60.0))
+        self.metrics.ring = self.audio_buffer
+        # Optional rolling capture of the audio around each wake/trigger/timeout (None = off)
+        self.clips = create_clip_recorder(config, self.sample_rate, wake_lookback=self.active_timeout)
+
+        # The model load is the slow part of startup; main.py defers it to overlap with other work
+        if not defer_load:
+            try:
+                self.load()
+            except Exception:
+                sys.exit(1)
+
+    def set_paused(self, paused):
+        self.paused = paused
+        if self.on_state_change:
+            self.on_state_change(self.paused)
+
+    def audio_callback(self, indata, frames, time, status):
+        """This is called (from a separate thread) for each audio block."""
+        if status:
+            self.metrics.record_status(status)
+            logging.warning(f"Audio status: {status}")
+        if self.resampler is not None:
+            self.resampler.process(indata, frames, self._write_block)
+        else:
+            self._write_block(indata, frames)
+
+    def _write_block(self, block, frames):
+        # Replay sources can outrun the decoder, so let them wait for space instead of dropping
+        self.audio_buffer.write(block, frames, wait=1.0 if self.source.lossless else None)
+
+    def now(self):
+        """Clock used for the ACTIVE timeout.
+
+        Replay sources run faster than real time, so they are timed by the
+        amount of audio consumed rather than the wall clock.
+        """
+        if self.timed_by_audio():
+            return self.samples_processed / self.sample_rate
+        return time.monotonic()
+
+    def timed_by_audio(self):
+        """True for replay sources, whose deadlines are checked against the audio clock per span."""
+        return self.source.lossless
+
+    def wait_ready(self, timeout):
+        """Wait (at most `timeout` seconds) for the audio source to become available."""
+        return self.source.wait_ready(timeout)
+
+    def emit(self, event, text=""):
+        if self.on_detection:
+            self.on_detection(event, text)
+
+    def record_event(self, event, text=""):
+        """Count a wake/trigger/timeout, mark it for clip capture and report it."""
+        self.metrics.record_event(event)
+        if self.clips:
+            self.clips.on_event(event, text, self.wake_ago(event))
+        self.emit(event, text)
+
+    def wake_ago(self, event):
+        """Seconds since the wake a trigger/timeout follows (None for a wake, or a clap trigger while IDLE)."""
+        if event == "wake" or (event == "trigger" and self.state != "ACTIVE"):
+            return None
+        return max(0.0, self.now() - self.last_wake_time)
+
+    def load(self):
+        """Load the Vosk model (unless one was passed in) and build the recognizer."""
+        started = time.perf_counter()
+        self.load_model()
+
         # Construct Grammar to filter noise
         # Note: Vocabulary must be in the model. If user uses custom words not in model, they warn.
         # But standard small models usually have common words.
         # Grammar format: list of strings.
-        # We allow wake phrase, trigger phrase, and [unk] for unknown.
-        # If phrases have multiple words, we should include individual words? 
+        # We allow the wake phrase, every command phrase, and [unk] for unknown.
         # Vosk grammar expects a JSON list of strings as the string representation.
-        # Example: '["wake up", "open", "[unk]"]'
-        
-        grammar = [self.wake_phrase, self.trigger_phrase, "[unk]"]
-        grammar_str = json.dumps(grammar)
+        # Example: '["wake up", "open", "open music", "[unk]"]'
+        self.rec = self.create_recognizer(build_grammar(self.wake_table, self.command_table))
+        self.metrics.load_seconds = time.perf_counter() - started
+        self.ready.set()
+
+    def load_model(self):
+        if self.model is None and not self.decoder_process:
+            try:
+                logging.info(f"Loading Vosk model from {self.model_path}...")
+                started = time.perf_counter()
+                self.model = vosk.Model(self.model_path)
+                logging.info(f"Model loaded successfully in {time.perf_counter() - started:.2f}s.")
+            except Exception as e:
+                logging.critical(f"Failed to load model from {self.model_path}: {e}")
+                raise
+
+    def create_recognizer(self, grammar_str):
         logging.info(f"Vosk Grammar set to: {grammar_str}")
-        
+        if self.decoder_process:
+            # The worker loads its own copy of the model and handles the grammar fallback itself
+            from decoder_worker import RemoteRecognizer
+            return RemoteRecognizer(self.model_path, 16000, grammar_str, partials=self.early_detection,
+                                    reply_timeout=self.config.get("decoder_timeout", 1.0))
         try:
-            self.rec = vosk.KaldiRecognizer(self.model, 16000, grammar_str)
+            rec = vosk.KaldiRecognizer(self.model, 16000, grammar_str)
         except Exception as e:
             logging.warning(f"Failed to set grammar ({e}). Falling back to full vocabulary.")
-            self.rec = vosk.KaldiRecognizer(self.model, 16000)
+            rec = vosk.KaldiRecognizer(self.model, 16000)
+        rec.SetWords(True) # Per-word confidence in final results, for the thresholds
+        return rec
 
-        self.audio_queue = queue.Queue()
+    def _build_phrases(self, config):
+        """Wake phrase and command lookup tables for a config."""
+        wake_phrase = config.get("wake_phrase", "wake up").lower()
+        trigger_phrase = config.get("trigger_phrase", "open").lower()
+        wake_table = PhraseTable()
+        wake_table.add(wake_phrase, "wake")
+        command_table = build_command_table(dict(config, trigger_phrase=trigger_phrase))
+        # Minimum word confidence per phrase, e.g. {"hey": 0.8}; min_confidence covers the rest
+        thresholds = {" ".join(phrase.lower().split()): value
+                      for phrase, value in config.get("confidence_thresholds", {}).items()}
+        return {"wake_phrase": wake_phrase, "trigger_phrase": trigger_phrase,
+                "wake_table": wake_table, "command_table": command_table,
+                "thresholds": thresholds, "min_confidence": config.get("min_confidence", 0.0)}
 
-    def set_paused(self, paused):
-        self.paused = paused
-        if self.on_state_change:
-            self.on_state_change(self.paused)
+    def _apply_phrases(self, phrases):
+        self.wake_phrase = phrases["wake_phrase"]
+        self.trigger_phrase = phrases["trigger_phrase"]
+        self.wake_table = phrases["wake_table"]
+        self.command_table = phrases["command_table"]
+        self.confidence_thresholds = phrases["thresholds"]
+        self.min_confidence = phrases["min_confidence"]
 
-    def audio_callback(self, indata, frames, time, status):
-        """This is called (from a separate thread) for each audio block."""
-        if status:
-            logging.warning(f"Audio status: {status}")
-            print(status, file=sys.stderr)
-        self.audio_queue.put(bytes(indata))
+    def reload_config(self, config):
+        """Apply new phrases/commands without restarting.
+
+        The new grammar is compiled into a fresh KaldiRecognizer on a
+        background thread; the decode loop swaps it in between two blocks,
+        so no audio is dropped and decoding never waits on the compile.
+        """
+        self.config = config
+        self.denoiser.set_enabled(config.get("denoise", False))
+        self.kws_confirm = config.get("kws_confirm", True)
+        self.clap_mode = config.get("clap_mode", "off")
+        self.clap_only = config.get("clap_only", False)
+        self.clap = create_clap_detector(config, self.sample_rate)
+        with self._swap_lock:
+            self._reload_generation += 1
+            generation = self._reload_generation
+
+        def build():
+            # Wake templates may have been re-enrolled; they don't depend on the model
+            self.set_spotter(create_keyword_spotter(config, self.sample_rate))
+            self.ready.wait() # Needs the model; a reload during startup just waits for it
+            started = time.perf_counter()
+            phrases = self._build_phrases(config)
+            rec = self.create_recognizer(build_grammar(phrases["wake_table"], phrases["command_table"]))
+            with self._swap_lock:
+                if generation != self._reload_generation:
+                    return # A newer reload superseded this one
+                self._pending_swap = (rec, phrases)
+            logging.info(f"New recognizer ready in {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+        threading.Thread(target=build, daemon=True).start()
+
+    def _apply_pending_swap(self):
+        """Swap in a recognizer prepared by reload_config(). Called between blocks."""
+        with self._swap_lock:
+            rec, phrases = self._pending_swap
+            self._pending_swap = None
+        # Finish the utterance in flight with the old grammar before switching
+        self.handle_result(self.rec.FinalResult())
+        old_rec, self.rec = self.rec, rec
+        self._apply_phrases(phrases)
+        if hasattr(old_rec, "close"):
+            old_rec.close() # Stop the old decoder worker
+        logging.info("Recognizer swapped; new phrases active.")
+
+    def handle_result(self, result_json):
+        """Run the IDLE/ACTIVE state machine on one final recognizer result."""
+        started = time.perf_counter_ns()
+        result = json.loads(result_json)
+        self.metrics.parse.time(started)
+        text = result.get("text", "")
+
+        if text and text != "[unk]":
+            logging.info(f"Heard: {text}", extra={"fields": {"event": "heard", "text": text}})
+            if self.clips:
+                self.clips.note_result(text)
+
+        self.check_phrases(text, words=result.get("result"))
+        # The utterance is over, so early-detection guards start fresh
+        self._partial_hits = 0
+        self._early_fired.clear()
+
+    def handle_partial(self, partial_json):
+        """Fire early once the expected phrase is stable across consecutive partial results."""
+        started = time.perf_counter_ns()
+        text = json.loads(partial_json).get("partial", "")
+        self.metrics.parse.time(started)
+        if text and self.expected_table().match(text):
+            self._partial_hits += 1
+        else:
+            self._partial_hits = 0
+
+        if self._partial_hits >= self.early_partials:
+            self._partial_hits = 0
+            logging.info(f"Early detection on partial: {text}")
+            self.check_phrases(text, early=True)
+
+    def expected_table(self):
+        """Phrases that would move the state machine right now."""
+        return self.wake_table if self.state == "IDLE" else self.command_table
+
+    def accept_phrase(self, phrase, words, early=False):
+        """Check a matched phrase against its confidence threshold.
+
+        words is the per-word list from a final Vosk result. Partial results
+        carry no confidence, so a thresholded phrase never fires early; the
+        final result of the utterance decides instead.
+        """
+        threshold = self.confidence_thresholds.get(phrase, self.min_confidence)
+        if threshold <= 0:
+            return True
+        if words is None:
+            return False
+        confidence = phrase_confidence(phrase, words)
+        if confidence < threshold:
+            logging.info(f"Rejected '{phrase}': confidence {confidence:.2f} below {threshold:.2f}")
+            return False
+        return True
+
+    def check_phrases(self, text, early=False, words=None):
+        # Events fired early are remembered so the final result of the same utterance can't fire them again
+        with self._state_lock:
+            if self.state == "IDLE":
+                match = self.wake_table.match(text) if "wake" not in self._early_fired else None
+                if match and self.accept_phrase(match[0], words, early):
+                    if early:
+                        self._early_fired.add("wake")
+                    logging.info(f"Wake word '{self.wake_phrase}' detected! Waiting for command...",
+                                 extra={"fields": {"event": "wake", "phrase": match[0], "early": early}})
+                    self.set_state("ACTIVE")
+                    self.last_wake_time = self.now()
+                    self.arm_timeout()
+                    self.record_event("wake", text)
+
+            elif self.state == "ACTIVE":
+                match = self.command_table.match(text) if "trigger" not in self._early_fired else None
+                if match and self.accept_phrase(match[0], words, early):
+                    phrase, actions = match
+                    if early:
+                        self._early_fired.add("trigger")
+                    logging.info(f"Command '{phrase}' detected! Launching apps...",
+                                 extra={"fields": {"event": "trigger", "phrase": phrase, "early": early}})
+                    self.record_event("trigger", text)
+                    self.cancel_timeout()
+                    self.dispatch(actions)
+                    self.set_state("IDLE")
+                    self.set_paused(True) # Pause and release resources
+                    logging.info("Paused. Enable via tray icon.")
+
+    def set_state(self, state):
+        self.metrics.record_transition(self.state, state)
+        self.state = state
+
+    def dispatch(self, actions):
+        """Run a command's actions."""
+        self.metrics.launches += 1
+        if actions == LAUNCH_ALL:
+            self.launcher.launch_all()
+        else:
+            self.launcher.run_actions(actions)
+
+    def prepare_stream(self):
+        """Reset per-stream state before (re)opening the audio source."""
+        self.audio_buffer.clear() # Don't decode stale audio from before a pause
+        capture_rate = self.source.resolve_capture_rate()
+        if capture_rate == self.sample_rate:
+            self.resampler = None
+        elif self.resampler is None or self.resampler.resampler.in_rate != capture_rate:
+            logging.info(f"Capturing at {capture_rate} Hz, resampling to {self.sample_rate} Hz.")
+            self.resampler = BlockResampler(capture_rate, self.sample_rate, self.blocksize)
+        else:
+            self.resampler.reset()
+        if self.vad:
+            self.vad.reset()
+        self.denoiser.reset()
+        if self.features:
+            self.features.reset()
+        if self.kws:
+            self.kws.reset()
+        if self.clap:
+            self.clap.reset()
+        self.reset_decoder()
+        self._decoder_engaged = False
+        self._partial_hits = 0
+        self._early_fired.clear()
+
+    def reset_decoder(self):
+        if self._pending_swap is not None:
+            self._apply_pending_swap()
+        self.rec.Reset() # Forget any utterance left over from before the pause
+
+    def acquire_decoder(self, decision):
+        """Recognizer to feed the current span, or None to skip decoding it."""
+        return self.rec
+
+    def release_decoder(self, decision):
+        """Called after each span with the VAD decision; the single recognizer is kept."""
+        pass
+
+    def process_span(self, slot, n):
+        """Decode a span from the ring buffer and run the state machine on the outcome."""
+        if self._pending_swap is not None:
+            self._apply_pending_swap()
+        samples = self.audio_buffer.samples(slot, n)
+        self.samples_processed += len(samples)
+        if self.clips:
+            self.clips.append(samples) # Copied into the clip history before the slot is released
+        try:
+            clap = self.clap # May be replaced by reload_config
+            if clap and clap.process(samples) and self.handle_clap():
+                return # Launched and paused; decoding the rest of the span could wake it again
+            decision = self.vad.process(samples) if self.vad else VoiceGate.PASS
+            if self.clap_only:
+                decision = VoiceGate.SKIP
+            kws, features = self.kws, self.features # May be swapped from another thread by set_spotter
+            if features:
+                log_mel, mfcc = features.process(samples)
+            if kws and self.listening_for_wake() and not self.clap_only:
+                if self._decoder_engaged:
+                    self.reset_decoder() # Drop what was left of the ACTIVE utterance
+                    self._decoder_engaged = False
+                if kws.process(samples, mfcc, match=decision != VoiceGate.SKIP):
+                    if self.kws_confirm:
+                        self.confirm_wake(kws)
+                    else:
+                        self.direct_wake(f"Enrolled wake phrase '{self.wake_phrase}'")
+                decision = VoiceGate.SKIP
+            rec = self.acquire_decoder(decision) if decision != VoiceGate.SKIP else None
+            if rec is None:
+                decision = VoiceGate.SKIP
+            else:
+                self._decoder_engaged = True
+            if decision == VoiceGate.OPEN:
+                self.denoiser.reset() # Don't overlap-add leftovers from the previous utterance
+                # Feed the audio just before the onset so the first word isn't clipped
+                for block in self.vad.preroll():
+                    if not self.denoiser.bypassed:
+                        block = self.denoiser.process(np.frombuffer(block, dtype=np.int16)).tobytes()
+                    if rec.AcceptWaveform(block):
+                        self.handle_result(rec.Result())
+            accepted = False
+            if decision != VoiceGate.SKIP:
+                if not self.denoiser.bypassed:
+                    data = self.denoiser.process(samples).tobytes()
+                else:
+                    # Kaldi copies the samples internally, so the slot can be released right after
+                    data = self.audio_buffer.data(slot, n)
+                started = time.perf_counter_ns()
+                accepted = rec.AcceptWaveform(data)
+                self.metrics.accept.time(started)
+        finally:
+            self.audio_buffer.release(n)
+            self.metrics.blocks_processed += n
+            self.metrics.spans_processed += 1
+
+        if accepted:
+            self.handle_result(rec.Result())
+        elif self.early_detection and decision != VoiceGate.SKIP:
+            self.handle_partial(rec.PartialResult())
+        if decision == VoiceGate.CLOSE:
+            # Speech is over; make Vosk finish whatever utterance it was holding
+            self.handle_result(rec.FinalResult())
+        self.release_decoder(decision)
+
+        self.check_timeout()
+
+    def arm_timeout(self):
+        """Schedule the ACTIVE timeout for the wake that just happened (live sources only)."""
+        self.cancel_timeout()
+        if not self.timed_by_audio():
+            self._timeout_timer = self.timers.call_later(self.active_timeout, self._on_timeout, self.last_wake_time)
+
+    def cancel_timeout(self):
+        if self._timeout_timer is not None:
+            self._timeout_timer.cancel()
+            self._timeout_timer = None
+
+    def _on_timeout(self, wake_time):
+        # Runs on the timer thread; ignore it if a command or a newer wake got there first
+        with self._state_lock:
+            if self.state == "ACTIVE" and self.last_wake_time == wake_time:
+                self._timeout_timer = None
+                self.expire_active()
+
+    def listening_for_wake(self):
+        return self.state == "IDLE"
+
+    def confirm_wake(self, kws):
+        """Second stage of the wake cascade: decode the spotter's buffered audio with Vosk."""
+        rec = self.acquire_decoder(VoiceGate.OPEN)
+        if rec is None:
+            return
+        started = time.thread_time()
+        rec.Reset()
+        rec.AcceptWaveform(kws.window().tobytes())
+        result = rec.FinalResult()
+        kws.decoder_cpu_seconds += time.thread_time() - started
+        self.handle_result(result)
+        if not self.listening_for_wake():
+            kws.confirmed += 1
+        self.release_decoder(VoiceGate.CLOSE)
+
+    def direct_wake(self, what):
+        """Wake without the recognizer: a spotter hit with kws_confirm off, or a double clap.
+
+        The detector has already made its decision, so the wake phrase is
+        passed on as if Vosk had heard it with full confidence; the state
+        machine (and, with several devices, the dedup) runs as usual.
+        """
+        logging.info(f"{what} detected.")
+        self.check_phrases(self.wake_phrase, words=[{"word": w, "conf": 1.0} for w in self.wake_phrase.split()])
+
+    def handle_clap(self):
+        """Double clap: wake (clap_mode "wake") or launch the apps straight away (clap_mode "command").
+
+        Returns True if it launched (and paused the listener).
+        """
+        with self._state_lock:
+            if self.clap_mode == "wake":
+                if self.listening_for_wake():
+                    self.direct_wake("Double clap")
+                return False
+            logging.info("Double clap detected! Launching apps...",
+                         extra={"fields": {"event": "trigger", "clap": True}})
+            self.cancel_timeout()
+            self.record_event("trigger", "double clap")
+            self.dispatch(LAUNCH_ALL)
+            self.set_state("IDLE")
+            self.set_paused(True)
+            logging.info("Paused. Enable via tray icon.")
+            return True
+
+    def set_spotter(self, kws):
+        """Install (or with None, remove) the wake spotter; safe to call while the decode loop runs."""
+        if kws and self.features is None:
+            self.features = FeatureExtractor(self.sample_rate)
+        self.kws = kws
+
+    def check_timeout(self):
+        # Replay runs faster than real time, so its timeout is checked against the audio clock per span
+        if self.timed_by_audio() and self.state == "ACTIVE":
+            if self.now() - self.last_wake_time > self.active_timeout:
+                self.expire_active()
+
+    def expire_active(self):
+        logging.info("Timeout waiting for command. Returning to IDLE.", extra={"fields": {"event": "timeout"}})
+        self.set_state("IDLE")
+        self.record_event("timeout")
+
+    def end_stream(self):
+        """The stream is closing (pause, stop or end of replay); save clips still waiting for audio."""
+        if self.clips:
+            self.clips.flush()
+
+    def finish_source(self):
+        """Replay ran out: finish the last utterance and stop."""
+        self.handle_result(self.rec.FinalResult())
+        self.end_stream()
+        logging.info("Audio source finished.")
+        self.running = False
 
     def run(self):
+        if not self.ready.is_set():
+            self.load()
         self.running = True
         logging.info("Listener started.")
-        print("Listener started.")
         
         while self.running:
             if not self.paused:
                 logging.info("Microphone Active. Listening...")
-                print("Microphone Active. Listening...")
                 try:
                     # Check devices strictly before opening stream
                     # devices = sd.query_devices() # Detailed check could go here
                     
-                    with sd.RawInputStream(samplerate=16000, blocksize=4000, dtype='int16',
-                                           channels=1, callback=self.audio_callback):
+                    self.prepare_stream()
+                    with self.source.open(self.audio_callback):
+                        if self.stream_backoff.attempts:
+                            logging.info(f"Audio stream recovered after {self.stream_backoff.attempts} retries "
+                                         f"({self.stream_backoff.elapsed:.2f}s).")
+                        self.stream_backoff.reset()
                         while self.running and not self.paused:
-                            try:
-                                data = self.audio_queue.get(timeout=1.0) # Increased timeout slightly to reduce busy loops
-                                if self.rec.AcceptWaveform(data):
-                                    result = json.loads(self.rec.Result())
-                                    text = result.get("text", "")
-                                    
-                                    if text and text != "[unk]":
-                                        logging.info(f"Heard: {text}")
-                                        print(f"Heard: {text}")
-
-                                    if self.state == "IDLE":
-                                        if self.wake_phrase in text:
-                                            logging.info(f"Wake word '{self.wake_phrase}' detected!")
-                                            print(f"Wake word '{self.wake_phrase}' detected! Waiting for command...")
-                                            self.state = "ACTIVE"
-                                            self.last_wake_time = time.time()
-                                    
-                                    elif self.state == "ACTIVE":
-                                        if self.trigger_phrase in text:
-                                            logging.info("Command 'open' detected!")
-                                            print("Command 'open' detected! Launching apps...")
-                                            self.launcher.launch_all()
-                                            self.state = "IDLE"
-                                            self.set_paused(True) # Pause and release resources
-                                            print("Paused. Enable via tray icon.")
-                                
-                                # Handle Timeout
-                                if self.state == "ACTIVE":
-                                    if time.time() - self.last_wake_time > self.active_timeout:
-                                        msg = "Timeout waiting for command. Returning to IDLE."
-                                        logging.info(msg)
-                                        print(msg)
-                                        self.state = "IDLE"
-
-                            except queue.Empty:
-                                pass
+                            # While IDLE, decode several blocks per step (adaptive profile); while ACTIVE, every block
+                            batch = self.idle_batch if self.state == "IDLE" else 1
+                            waited = time.perf_counter_ns()
+                            span = self.audio_buffer.get(timeout=0.1 if self.source.lossless else 1.0, count=batch)
+                            self.metrics.maybe_log()
+                            if span is None:
+                                if self.source.finished.is_set() and not len(self.audio_buffer):
+                                    self.finish_source()
+                                continue
+                            self.metrics.queue_wait.time(waited)
+                            self.process_span(*span)
+                    self.end_stream()
+
                 except Exception as e:
                     logging.error(f"Audio stream error: {e}")
-                    print(f"Audio stream error: {e}")
-                    time.sleep(2) # Wait a bit before retrying if stream fails
+                    if not self.stream_backoff.attempts:
+                        self.stream_backoff.reset() # Time the outage from its first failure, not the last open
+                    self.stream_backoff.sleep() # Retry quickly at first, then back off
             else:
                 # Paused state - Minimal resource usage
                 time.sleep(0.5)
 
     def stop(self):
         self.running = False
+
+    def stats(self):
+        """Snapshot of the audio pipeline stages, detectors, clip store, timers and loop counters."""
+        return {
+            "audio": self.audio_buffer.stats(),
+            "vad": self.vad.stats() if self.vad else None,
+            "resampler": self.resampler.stats() if self.resampler else None,
+            "denoise": self.denoiser.stats(),
+            "features": self.features.stats() if self.features else None,
+            "kws": self.kws.stats() if self.kws else None,
+            "clap": self.clap.stats() if self.clap else None,
+            "clips": self.clips.writer.stats() if self.clips else None,
+            "timers": self.timers.stats(),
+            "metrics": self.metrics.snapshot(),
+        }
@@ -0,0 +1,154 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_state = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line. Structured values passed as extra={"fields": {...}} are merged in."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RepeatFilter(logging.Filter):
+    """Rate-limits repeated recognizer output such as a stream of "Heard: [unk]".
+
+    Only messages starting with one of `prefixes` are limited; detections,
+    errors and everything else always pass. The same message passes at most
+    `burst` times per `window` seconds. When a window in which lines were
+    dropped closes, one line saying how many is sent straight to `sink`.
+    """
+
+    def __init__(self, window=10.0, burst=3, prefixes=("Heard:",), sink=None):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.prefixes = prefixes
+        self.sink = sink # Handler for the "(repeated N more times)" lines
+        self._seen = {} # (level, message) -> [window start, count, suppressed, first dropped record]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.window or not isinstance(record.msg, str) or not record.msg.startswith(self.prefixes):
+            return True
+        key = (record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] > self.window:
+                if len(self._seen) > 1000:
+                    self._seen.clear() # Only recent lines matter; keep the table small
+                self._seen[key] = [now, 1, 0, None]
+                return True
+            entry[1] += 1
+            if entry[1] <= self.burst:
+                return True
+            entry[2] += 1
+            if entry[3] is None:
+                # First drop in this window: report the count when it closes
+                entry[3] = record
+                timer = threading.Timer(entry[0] + self.window - now, self._report, (key, entry))
+                timer.daemon = True
+                timer.start()
+            return False
+
+    def _report(self, key, entry):
+        with self._lock:
+            if self._seen.get(key) is entry:
+                del self._seen[key]
+            suppressed, record = entry[2], entry[3]
+            entry[2] = 0 # flush() and the timer may both get here
+        if suppressed and self.sink:
+            summary = logging.LogRecord(record.name, record.levelno, record.pathname, record.lineno,
+                                        f"{key[1]} (repeated {suppressed} more times)", None, None)
+            fields = getattr(record, "fields", None)
+            if fields:
+                summary.fields = dict(fields, repeated=suppressed)
+            self.sink.emit(summary)
+
+    def flush(self):
+        """Report drops in windows that are still open (e.g. at exit)."""
+        with self._lock:
+            pending = [(key, entry) for key, entry in self._seen.items() if entry[2]]
+        for key, entry in pending:
+            self._report(key, entry)
+
+
+def setup_logging(log_file, level=logging.INFO):
+    """Route all logging through a queue to a rotating file (and the console, if there is one).
+
+    Callers only pay for putting the record on the queue; formatting and
+    disk I/O happen on the QueueListener's thread, so the decode loop never
+    waits on the disk. Rotation size, format and rate limit start at their
+    defaults and can be changed with configure_logging(config).
+    """
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8", delay=True)
+    file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers = [file_handler]
+    if sys.stdout is not None: # None under pythonw
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter('%(message)s'))
+        handlers.append(console)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    repeat_filter = RepeatFilter(sink=queue_handler)
+    queue_handler.addFilter(repeat_filter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_listener.start()
+    atexit.register(stop_logging)
+    _state.update(file_handler=file_handler, repeat_filter=repeat_filter, queue_listener=queue_listener)
+
+
+def configure_logging(config):
+    """Apply log_max_bytes, log_backups, log_format ("text"/"json") and log_repeat_window/burst."""
+    if not _state:
+        return
+    file_handler = _state["file_handler"]
+    file_handler.maxBytes = config.get("log_max_bytes", 5 * 1024 * 1024)
+    file_handler.backupCount = config.get("log_backups", 3)
+    if config.get("log_format", "text") == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    repeat_filter = _state["repeat_filter"]
+    repeat_filter.window = config.get("log_repeat_window", 10.0)
+    repeat_filter.burst = config.get("log_repeat_burst", 3)
+
+
+def stop_logging():
+    """Flush queued records to disk. Call before os._exit(), which skips atexit."""
+    queue_listener = _state.pop("queue_listener", None)
+    if queue_listener:
+        _state["repeat_filter"].flush()
+        queue_listener.stop()
+        for handler in queue_listener.handlers:
+            handler.flush()
@@ -10,26 +10,24 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 os.chdir(project_root)
 
-# Set up logging
-log_file = os.path.join(project_root, 'wake.log')
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
 # Add src to path if needed (though running this file usually puts it in path)
 if 'src' not in sys.path:
     sys.path.append('src')
 
-from listener import AudioListener
-from launcher import AppLauncher
-from tray import TrayIcon
+from log_setup import configure_logging, setup_logging, stop_logging
 
 def main():
+    # Set up logging (queued to a background thread, rotated by size). This and the UI imports live
+    # in main() because decoder workers are spawned: they re-run this file's top level as __mp_main__,
+    # and must not open a second handler on wake.log or load the tray.
+    setup_logging(os.path.join(project_root, 'wake.log'))
+
+    from multi_listener import create_listener
+    from launcher import AppLauncher
+    from tray import TrayIcon
+
     logging.info("----------------------------------------------------------------")
     logging.info("Starting Spoken_Shortcuts Application...")
-    print("Starting Spoken_Shortcuts...")
 
     # Load config
     try:
@@ -37,25 +35,51 @@ def main():
             config = json.load(f)
     except FileNotFoundError:
         logging.warning("Config not found, creating default.")
-        print("Config not found, creating default.")
         config = {"apps": ["calc.exe"], "clap_threshold": 3000, "wake_phrase": "wake up"}
     except Exception as e:
         logging.error(f"Error loading config: {e}")
         config = {"apps": ["calc.exe"], "clap_threshold": 3000, "wake_phrase": "wake up"}
+    configure_logging(config)
 
     # Startup Delay (to allow system audio/tray to initialize)
+    # In "probe" mode (default) this is only the budget for probing the audio device;
+    # "delay" mode keeps the old fixed sleep.
     startup_delay = config.get("startup_delay", 0)
-    if startup_delay > 0:
-        logging.info(f"Waiting for {startup_delay} seconds startup delay...")
-        time.sleep(startup_delay)
+    startup_mode = config.get("startup_mode", "probe")
+    started = time.perf_counter()
 
     try:
         launcher = AppLauncher(config['apps'])
-        listener = AudioListener(config, launcher)
+        listener = create_listener(config, launcher, defer_load=True)
         tray = TrayIcon(listener)
 
-        # Start listener in a separate thread
-        listener_thread = threading.Thread(target=listener.run)
+        # Optional Prometheus endpoint on localhost; nothing is imported or started unless configured
+        metrics_port = config.get("metrics_port")
+        if metrics_port:
+            from metrics_server import start_metrics_server
+            start_metrics_server(listener, int(metrics_port))
+
+        def start_listener():
+            # Load the model and build the recognizer while waiting for the audio device
+            loader = threading.Thread(target=listener.load, daemon=True)
+            loader.start()
+            if startup_mode == "delay" and startup_delay > 0:
+                logging.info(f"Waiting for {startup_delay} seconds startup delay...")
+                time.sleep(startup_delay)
+            elif startup_delay > 0:
+                logging.info(f"Probing audio device (budget {startup_delay}s)...")
+                if not listener.wait_ready(startup_delay):
+                    logging.warning("Audio device still not available; the listener will keep retrying.")
+            loader.join()
+            if not listener.ready.is_set():
+                logging.critical("Listener failed to load. Exiting.")
+                stop_logging()
+                os._exit(1)
+            logging.info(f"Ready to listen {time.perf_counter() - started:.2f}s after start.")
+            listener.run()
+
+        # Start listener in a separate thread (the tray comes up immediately meanwhile)
+        listener_thread = threading.Thread(target=start_listener)
         listener_thread.daemon = True
         listener_thread.start()
         logging.info("Listener thread started.")
@@ -0,0 +1,133 @@
+import logging
+import time
+
+
+class Timer:
+    """Accumulates durations (in ns) with a power-of-two histogram for percentiles.
+
+    add() is a handful of integer operations, so timers can stay on in the
+    hot path; percentiles are only approximate (within a factor of two).
+    """
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * 32 # Bucket i holds durations below 2**i microseconds
+
+    def add(self, ns):
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        self.buckets[min((ns >> 10).bit_length(), 31)] += 1
+
+    def time(self, start_ns):
+        """Record the time since start_ns (from time.perf_counter_ns())."""
+        self.add(time.perf_counter_ns() - start_ns)
+
+    def percentile(self, q):
+        """Upper bound of the q-quantile, in ms."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min((1 << i) * 1024, self.max) / 1e6
+        return self.max / 1e6
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count / 1e6 if self.count else None,
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max / 1e6,
+            "total_s": self.total / 1e9,
+        }
+
+
+class ListenerMetrics:
+    """Timers and counters for the listener's decode loop.
+
+    snapshot() returns everything as a dict for in-process consumers, and
+    maybe_log() writes a one-line summary every `interval` seconds (0 turns
+    the line off; the counters keep running).
+    """
+
+    TIMERS = ("queue_wait", "accept", "parse")
+
+    def __init__(self, interval=60.0, name="listener"):
+        self.name = name
+        self.interval = interval
+        self.started = time.monotonic()
+        self._next_log = self.started + interval if interval else None
+        self.queue_wait = Timer()    # Waiting for audio in the ring buffer
+        self.accept = Timer()        # AcceptWaveform per span
+        self.parse = Timer()         # json.loads of Result()/PartialResult()
+        self.blocks_processed = 0
+        self.spans_processed = 0
+        self.status_flags = 0        # Callbacks that reported any status
+        self.input_overflows = 0     # ... of which PortAudio input overflows
+        self.transitions = {}        # "IDLE->ACTIVE": count
+        self.events = {}             # "wake"/"trigger"/"timeout": count
+        self.launches = 0            # Commands dispatched
+        self.load_seconds = None     # Model + recognizer load time
+        self.ring = None             # Ring buffer whose drop counter is reported
+
+    def record_status(self, status):
+        self.status_flags += 1
+        if getattr(status, "input_overflow", False):
+            self.input_overflows += 1
+
+    def record_transition(self, old, new):
+        key = f"{old}->{new}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+
+    def record_event(self, event):
+        self.events[event] = self.events.get(event, 0) + 1
+
+    def snapshot(self):
+        ring = self.ring.stats() if self.ring else {}
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "blocks_processed": self.blocks_processed,
+            "spans_processed": self.spans_processed,
+            "blocks_dropped": ring.get("overruns", 0),
+            "status_flags": self.status_flags,
+            "input_overflows": self.input_overflows,
+            "transitions": dict(self.transitions),
+            "events": dict(self.events),
+            "launches": self.launches,
+            "load_seconds": self.load_seconds,
+            "queue_wait": self.queue_wait.snapshot(),
+            "accept": self.accept.snapshot(),
+            "parse": self.parse.snapshot(),
+        }
+
+    def summary_line(self):
+        snap = self.snapshot()
+
+        def ms(timer):
+            t = snap[timer]
+            if not t["count"]:
+                return f"{timer}=n/a"
+            return f"{timer}={t['mean_ms']:.2f}/{t['p99_ms']:.2f}/{t['max_ms']:.2f}ms"
+
+        transitions = ",".join(f"{k}:{v}" for k, v in sorted(snap["transitions"].items())) or "none"
+        return (f"[{self.name}] blocks={snap['blocks_processed']} dropped={snap['blocks_dropped']} "
+                f"overflows={snap['input_overflows']} status={snap['status_flags']} "
+                f"{ms('queue_wait')} {ms('accept')} {ms('parse')} (mean/p99/max) "
+                f"transitions={transitions}")
+
+    def maybe_log(self):
+        """Log the summary line if the interval has passed. Cheap enough to call every loop."""
+        if self._next_log is None:
+            return
+        now = time.monotonic()
+        if now >= self._next_log:
+            self._next_log = now + self.interval
+            logging.info(self.summary_line())
@@ -0,0 +1,152 @@
+import logging
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from metrics import ListenerMetrics
+
+PREFIX = "spoken_shortcuts"
+
+# Histogram buckets exported for the loop timers: Timer bucket i ends at 2**i * 1.024 us
+_BUCKETS = range(0, 25)
+
+
+def process_rss_bytes():
+    """Resident set size of this process, or None if the platform can't tell us."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32, psapi = ctypes.windll.kernel32, ctypes.windll.psapi
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS),
+                                               wintypes.DWORD]
+        if psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    return None
+
+
+class _Family:
+    """One metric family: HELP/TYPE header followed by its samples."""
+
+    def __init__(self, lines, name, kind, help_text):
+        self.lines = lines
+        self.name = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {self.name} {help_text}")
+        lines.append(f"# TYPE {self.name} {kind}")
+
+    def sample(self, value, suffix="", **labels):
+        if value is None:
+            return
+        label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        self.lines.append(f"{self.name}{suffix}{{{label_str}}} {value}" if labels else f"{self.name}{suffix} {value}")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _sources(listener):
+    """(device label, ListenerMetrics) for every capture loop the listener runs."""
+    channels = getattr(listener, "channels", None)
+    if channels:
+        return [(channel.name, channel.metrics) for channel in channels]
+    return [("default", listener.metrics)]
+
+
+def render(listener):
+    """The listener's metrics in Prometheus text exposition format."""
+    lines = []
+    metrics = listener.metrics
+    sources = _sources(listener)
+
+    family = _Family(lines, "state", "gauge", "Current listener state (1 = current).")
+    current = "paused" if listener.paused else listener.state
+    for state in ("IDLE", "ACTIVE", "paused"):
+        family.sample(int(current == state), state=state)
+    _Family(lines, "ready", "gauge", "1 once the model and recognizer are loaded.").sample(
+        int(listener.ready.is_set()))
+    _Family(lines, "model_load_seconds", "gauge", "Time taken to load the model and recognizer.").sample(
+        metrics.load_seconds)
+
+    family = _Family(lines, "detections_total", "counter", "Wake, trigger and timeout events.")
+    for event in ("wake", "trigger", "timeout"):
+        family.sample(metrics.events.get(event, 0), event=event)
+    _Family(lines, "launches_total", "counter", "Commands dispatched to the launcher.").sample(metrics.launches)
+    family = _Family(lines, "transitions_total", "counter", "State machine transitions.")
+    for key, count in sorted(metrics.transitions.items()):
+        old, new = key.split("->")
+        family.sample(count, **{"from": old, "to": new})
+
+    counters = [
+        ("blocks_processed_total", "Audio blocks decoded or skipped by the VAD.", lambda s: s["blocks_processed"]),
+        ("blocks_dropped_total", "Audio blocks dropped because the ring buffer was full.",
+         lambda s: s["blocks_dropped"]),
+        ("input_overflows_total", "Input overflows reported by the audio driver.", lambda s: s["input_overflows"]),
+        ("status_flags_total", "Audio callbacks that reported any status flag.", lambda s: s["status_flags"]),
+    ]
+    snapshots = [(device, m.snapshot()) for device, m in sources]
+    for name, help_text, value in counters:
+        family = _Family(lines, name, "counter", help_text)
+        for device, snap in snapshots:
+            family.sample(value(snap), device=device)
+
+    family = _Family(lines, "loop_seconds", "histogram",
+                     "Decode loop timings: queue_wait, accept (AcceptWaveform) and parse (result JSON).")
+    for device, m in sources:
+        for stage in ListenerMetrics.TIMERS:
+            timer = getattr(m, stage)
+            cumulative = 0
+            for i in _BUCKETS:
+                cumulative += timer.buckets[i]
+                family.sample(cumulative, "_bucket", device=device, stage=stage, le=f"{(1 << i) * 1.024e-6:.9g}")
+            family.sample(timer.count, "_bucket", device=device, stage=stage, le="+Inf")
+            family.sample(timer.total / 1e9, "_sum", device=device, stage=stage)
+            family.sample(timer.count, "_count", device=device, stage=stage)
+
+    _Family(lines, "resident_memory_bytes", "gauge", "Resident set size of the process.").sample(
+        process_rss_bytes())
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render(self.server.listener).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes every few seconds would flood wake.log
+
+
+def start_metrics_server(listener, port):
+    """Serve /metrics on 127.0.0.1:port from a daemon thread. Returns the server, or None if it can't bind."""
+    try:
+        server = HTTPServer(("127.0.0.1", port), _Handler)
+    except OSError as e:
+        logging.error(f"Metrics endpoint disabled: cannot listen on 127.0.0.1:{port} ({e})")
+        return None
+    server.listener = listener
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Metrics endpoint on http://127.0.0.1:{port}/metrics")
+    return server
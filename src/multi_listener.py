@@ -0,0 +1,362 @@
+import logging
+import queue
+import sys
+import threading
+import time
+from audio_source import create_audio_source
+from clap import create_clap_detector
+from clip_store import create_clip_recorder
+from intents import build_grammar
+from kws import create_keyword_spotter
+from listener import AudioListener
+from vad import VoiceGate
+
+
+class RecognizerPool:
+    """Fixed set of recognizers lent to device channels one utterance at a time.
+
+    Each recognizer holds a full decoder state, so rooms with many mics share
+    a few of them instead of decoding every device all the time. Recognizers
+    from before a reload are closed when they come back instead of being
+    reused.
+    """
+
+    def __init__(self, recognizers):
+        self.size = len(recognizers)
+        self._free = queue.Queue()
+        self._generation = 0
+        self._owners = {}
+        self._lock = threading.Lock()
+        self.replace(recognizers)
+        self.lent = 0
+        self.misses = 0 # acquire() calls that found every recognizer busy
+
+    def acquire(self):
+        try:
+            rec = self._free.get_nowait()
+        except queue.Empty:
+            self.misses += 1
+            return None
+        self.lent += 1
+        return rec
+
+    def release(self, rec):
+        with self._lock:
+            current = self._owners.get(id(rec)) == self._generation
+        if current:
+            rec.Reset()
+            self._free.put(rec)
+        else:
+            self._close(rec)
+
+    def replace(self, recognizers):
+        """Swap in a new set (e.g. after a grammar change)."""
+        with self._lock:
+            self._generation += 1
+            self._owners = {id(rec): self._generation for rec in recognizers}
+        while True:
+            try:
+                self._close(self._free.get_nowait())
+            except queue.Empty:
+                break
+        for rec in recognizers:
+            self._free.put(rec)
+        self.size = len(recognizers)
+
+    def _close(self, rec):
+        if hasattr(rec, "close"):
+            rec.close()
+
+    def stats(self):
+        return {"size": self.size, "free": self._free.qsize(), "lent": self.lent, "misses": self.misses}
+
+
+class DeviceChannel(AudioListener):
+    """One input device: its own stream, ring buffer, resampler and VAD.
+
+    A channel borrows a recognizer from the parent's pool when its VAD opens
+    and hands it back when the speech ends. Recognized text goes to the
+    parent, which owns the IDLE/ACTIVE state machine shared by all devices.
+    """
+
+    def __init__(self, parent, name, source):
+        super().__init__(parent.config, parent.launcher, source=source, defer_load=True)
+        self.parent = parent
+        self.name = name
+        self.metrics.name = f"device {name}"
+        if parent.clips:
+            # One writer (and one corpus.json) for all devices
+            self.clips = create_clip_recorder(parent.config, self.sample_rate, writer=parent.clips.writer,
+                                              wake_lookback=parent.active_timeout)
+        # Per-device counters
+        self.cpu_seconds = 0.0
+        self.spans = 0
+        self.utterances = 0
+        self.detections = {}
+        self.duplicates = 0
+
+    def load(self):
+        self.ready.set() # Recognizers come from the parent's pool
+
+    def reset_decoder(self):
+        if self.rec is not None:
+            self.parent.pool.release(self.rec)
+            self.rec = None
+
+    def acquire_decoder(self, decision):
+        if self.rec is None:
+            self.rec = self.parent.pool.acquire()
+            if self.rec is not None:
+                self.utterances += 1
+        return self.rec
+
+    def release_decoder(self, decision):
+        if decision == VoiceGate.CLOSE and self.rec is not None:
+            self.parent.pool.release(self.rec)
+            self.rec = None
+
+    def process_span(self, slot, n):
+        started = time.thread_time()
+        try:
+            super().process_span(slot, n)
+        finally:
+            self.cpu_seconds += time.thread_time() - started
+            self.spans += 1
+
+    def expected_table(self):
+        return self.parent.expected_table()
+
+    def listening_for_wake(self):
+        return self.parent.state == "IDLE"
+
+    def handle_clap(self):
+        return self.parent.handle_clap(channel=self)
+
+    def check_phrases(self, text, early=False, words=None):
+        self.parent.check_phrases(text, early, words, channel=self)
+
+    def check_timeout(self):
+        self.parent.check_timeout()
+
+    def now(self):
+        return self.parent.now()
+
+    def finish_source(self):
+        if self.rec is not None:
+            self.handle_result(self.rec.FinalResult())
+            self.reset_decoder()
+        logging.info(f"Audio source for device {self.name} finished.")
+        self.running = False
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            "cpu_seconds": self.cpu_seconds,
+            "spans": self.spans,
+            "utterances": self.utterances,
+            "detections": dict(self.detections),
+            "duplicates_suppressed": self.duplicates,
+        })
+        return stats
+
+
+class MultiDeviceListener(AudioListener):
+    """Listens on several input devices at once (config "input_devices").
+
+    Every device gets a DeviceChannel with its own capture thread and VAD;
+    only channels that hear speech borrow one of recognizer_pool_size
+    recognizers. Since all the mics in a room hear the same speaker, a
+    phrase that just moved the state machine is ignored when another device
+    reports it within device_dedup_window seconds, so one spoken wake phrase
+    fires once.
+    """
+
+    def __init__(self, config, launcher, devices=None, sources=None, model=None, defer_load=False):
+        # The parent never opens a stream itself; it only holds the shared state and the pool
+        super().__init__(config, launcher, source=sources[0] if sources else None, model=model, defer_load=True)
+        self.pool = None
+        self.dedup_window = config.get("device_dedup_window", 1.5)
+        self._last_fired = None # (phrase, channel, time) of the last state change
+        self._firing_channel = None # Device whose text is being checked
+
+        if sources is None:
+            devices = devices if devices is not None else config.get("input_devices", [None])
+            sources = [create_audio_source(dict(config, input_device=device, audio_file=None), self.capture)
+                       for device in devices]
+        else:
+            devices = devices or [f"source{i}" for i in range(len(sources))]
+        self.channels = [DeviceChannel(self, str(device), source) for device, source in zip(devices, sources)]
+        self.pool_size = max(1, min(config.get("recognizer_pool_size", 2), len(self.channels)))
+        if self.pool_size < len(self.channels) and not all(ch.vad for ch in self.channels):
+            logging.warning("recognizer_pool_size is smaller than the number of devices but the VAD is off; "
+                            "devices without a recognizer will not be decoded.")
+
+        if not defer_load:
+            try:
+                self.load()
+            except Exception:
+                sys.exit(1)
+
+    def load(self):
+        """Load the model once and fill the recognizer pool."""
+        started = time.perf_counter()
+        self.load_model()
+        grammar = build_grammar(self.wake_table, self.command_table)
+        self.pool = RecognizerPool([self.create_recognizer(grammar) for _ in range(self.pool_size)])
+        logging.info(f"Listening on {len(self.channels)} device(s) with {self.pool_size} recognizer(s).")
+        self.metrics.load_seconds = time.perf_counter() - started
+        self.ready.set()
+
+    def reload_config(self, config):
+        """Rebuild the whole pool in the background, then swap it and the phrases in together."""
+        self.config = config
+        self.clap_mode = config.get("clap_mode", "off")
+        with self._swap_lock:
+            self._reload_generation += 1
+            generation = self._reload_generation
+
+        def build():
+            for channel in self.channels:
+                channel.denoiser.set_enabled(config.get("denoise", False))
+                channel.kws_confirm = config.get("kws_confirm", True)
+                channel.clap_mode = config.get("clap_mode", "off")
+                channel.clap_only = config.get("clap_only", False)
+                channel.clap = create_clap_detector(config, channel.sample_rate)
+                channel.set_spotter(create_keyword_spotter(config, channel.sample_rate))
+            self.ready.wait()
+            phrases = self._build_phrases(config)
+            grammar = build_grammar(phrases["wake_table"], phrases["command_table"])
+            recognizers = [self.create_recognizer(grammar) for _ in range(self.pool_size)]
+            with self._swap_lock:
+                if generation != self._reload_generation:
+                    for rec in recognizers:
+                        self.pool._close(rec)
+                    return
+                with self._state_lock:
+                    self._apply_phrases(phrases)
+                    for channel in self.channels:
+                        channel._apply_phrases(phrases) # direct_wake() on a channel sends its wake_phrase
+                    self.pool.replace(recognizers)
+            logging.info("Recognizer pool swapped; new phrases active.")
+
+        threading.Thread(target=build, daemon=True).start()
+
+    def wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        ready = True
+        for channel in self.channels:
+            ready = channel.wait_ready(max(0.0, deadline - time.monotonic())) and ready
+        return ready
+
+    def now(self):
+        if self.timed_by_audio():
+            # Replay: the devices run in parallel, so the furthest one is "now"
+            return max(ch.samples_processed for ch in self.channels) / self.sample_rate
+        return time.monotonic()
+
+    def timed_by_audio(self):
+        return all(ch.source.lossless for ch in self.channels)
+
+    def _is_duplicate(self, text, channel):
+        if self._last_fired is None:
+            return False
+        phrase, source, fired_at = self._last_fired
+        if source is channel or self.now() - fired_at > self.dedup_window:
+            return False
+        return f" {phrase} " in f" {' '.join(text.split())} "
+
+    def check_phrases(self, text, early=False, words=None, channel=None):
+        with self._state_lock:
+            if channel is not None and self._is_duplicate(text, channel):
+                channel.duplicates += 1
+                logging.info(f"Ignoring '{text}' from device {channel.name}: already handled from another device.")
+                return
+            if channel is not None:
+                # Early-detection guards belong to the utterance on that device
+                self._early_fired = channel._early_fired
+            self._firing_channel = channel
+            state = self.state
+            match = self.expected_table().match(text)
+            super().check_phrases(text, early, words)
+            if self.state != state and match:
+                self._last_fired = (match[0], channel, self.now())
+                if channel is not None:
+                    event = "wake" if state == "IDLE" else "trigger"
+                    channel.detections[event] = channel.detections.get(event, 0) + 1
+
+    def check_timeout(self):
+        with self._state_lock:
+            super().check_timeout()
+
+    def handle_clap(self, channel=None):
+        with self._state_lock:
+            if channel is not None and self._is_duplicate("double clap", channel):
+                channel.duplicates += 1
+                return False
+            if self.clap_mode == "wake" and channel is not None:
+                if self.state == "IDLE":
+                    channel.direct_wake("Double clap") # Through check_phrases, so it's deduplicated like speech
+                return False
+            self._firing_channel = channel
+            launched = super().handle_clap()
+            self._last_fired = ("double clap", channel, self.now())
+            return launched
+
+    def record_event(self, event, text=""):
+        # The parent hears no audio; the clip comes from the device that fired (for a timeout, the one that woke)
+        channel = self._last_fired[1] if self._last_fired else None
+        if event != "timeout":
+            channel = self._firing_channel
+        self.metrics.record_event(event)
+        if channel is not None and channel.clips:
+            channel.clips.on_event(event, text, self.wake_ago(event))
+        self.emit(event, text)
+
+    def set_paused(self, paused):
+        for channel in self.channels:
+            channel.paused = paused
+        super().set_paused(paused)
+
+    def stop(self):
+        for channel in self.channels:
+            channel.stop()
+        super().stop()
+
+    def run(self):
+        if not self.ready.is_set():
+            self.load()
+        self.running = True
+        for channel in self.channels:
+            channel.paused = self.paused
+        threads = []
+        for channel in self.channels:
+            thread = threading.Thread(target=channel.run, name=f"device-{channel.name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        # State transitions are counted here, so the parent logs its own summary line
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1.0)
+                self.metrics.maybe_log()
+        self.running = False
+        self.log_device_stats()
+
+    def log_device_stats(self):
+        for channel in self.channels:
+            logging.info(f"Device {channel.name}: cpu={channel.cpu_seconds:.2f}s spans={channel.spans} "
+                         f"utterances={channel.utterances} detections={channel.detections} "
+                         f"duplicates={channel.duplicates}")
+
+    def stats(self):
+        return {
+            "devices": {channel.name: channel.stats() for channel in self.channels},
+            "pool": self.pool.stats() if self.pool else None,
+            "metrics": self.metrics.snapshot(),
+        }
+
+
+def create_listener(config, launcher, **kwargs):
+    """AudioListener for one device, or MultiDeviceListener when config lists several input_devices."""
+    if len(config.get("input_devices", [])) > 1 and not config.get("audio_file"):
+        return MultiDeviceListener(config, launcher, **kwargs)
+    return AudioListener(config, launcher, **kwargs)
@@ -0,0 +1,137 @@
+import threading
+import numpy as np
+
+try:
+    import cffi
+    _ffi = cffi.FFI()
+except ImportError:  # cffi ships with vosk/sounddevice, but don't hard-require it
+    _ffi = None
+
+
+class AudioRingBuffer:
+    """Fixed-capacity ring of int16 audio blocks.
+
+    The PortAudio callback (single writer) copies each block into the next
+    free slot and the decode loop (single reader) works on views of the
+    oldest slots, releasing them when done. All storage is allocated once, so
+    neither side creates per-block objects. If the reader falls behind, new
+    blocks are dropped and counted as overruns instead of growing memory.
+
+    The reader may take several consecutive slots at once (a span); as slots
+    are contiguous in memory, a span is still a single zero-copy view.
+    """
+
+    def __init__(self, block_frames, capacity=16):
+        self.block_frames = block_frames
+        self.capacity = capacity
+
+        self._storage = bytearray(block_frames * 2 * capacity)
+        self._samples = np.frombuffer(self._storage, dtype=np.int16).reshape(capacity, block_frames)
+        self._flat = self._samples.reshape(-1)
+        self._bytes = memoryview(self._storage)
+        # Pointer handed to Kaldi (cffi only accepts bytes or cdata for char*); sliced per span
+        self._cdata = _ffi.from_buffer(self._storage) if _ffi else None
+        self._lengths = [0] * capacity
+
+        self._read = 0
+        self._write = 0
+        self._count = 0
+        self._cond = threading.Condition()
+
+        # Counters
+        self.blocks_written = 0
+        self.blocks_read = 0
+        self.overruns = 0
+        self.max_fill = 0
+
+    def write(self, indata, frames, wait=None):
+        """Copy one block from the audio callback. Returns False on overrun.
+
+        Live capture must never block, so by default a full ring drops the
+        block. Replay sources pass `wait` (seconds) to apply back-pressure.
+        """
+        frames = min(frames, self.block_frames)
+        with self._cond:
+            if self._count == self.capacity and wait:
+                self._cond.wait_for(lambda: self._count < self.capacity, wait)
+            if self._count == self.capacity:
+                self.overruns += 1
+                return False
+            slot = self._write
+        # Copy outside the lock; the reader never touches a slot that isn't committed yet
+        self._samples[slot, :frames] = np.frombuffer(indata, dtype=np.int16, count=frames)
+        self._lengths[slot] = frames
+        with self._cond:
+            self._write = (slot + 1) % self.capacity
+            self._count += 1
+            self.blocks_written += 1
+            if self._count > self.max_fill:
+                self.max_fill = self._count
+            self._cond.notify()
+        return True
+
+    def get(self, timeout=None, count=1):
+        """Wait for up to `count` of the oldest blocks.
+
+        Returns (slot, n) for a span of n consecutive slots starting at slot,
+        or None if nothing arrived before the timeout. If fewer than `count`
+        blocks are ready at the timeout, the span is shorter. Spans never wrap
+        around the end of the ring and end at the first short block. The slots
+        stay owned by the reader until release(n) is called.
+        """
+        with self._cond:
+            if self._count < count:
+                self._cond.wait_for(lambda: self._count >= count, timeout)
+                if self._count == 0:
+                    return None
+            slot = self._read
+            n = min(count, self._count, self.capacity - slot)
+            for i in range(n - 1):
+                if self._lengths[slot + i] != self.block_frames:
+                    n = i + 1
+                    break
+            return slot, n
+
+    def release(self, n=1):
+        """Hand the span returned by get() back to the writer."""
+        with self._cond:
+            n = min(n, self._count)
+            self._read = (self._read + n) % self.capacity
+            self._count -= n
+            self.blocks_read += n
+            self._cond.notify()
+
+    def _span_frames(self, slot, n):
+        return (n - 1) * self.block_frames + self._lengths[slot + n - 1]
+
+    def samples(self, slot, n=1):
+        """Zero-copy int16 view of a span."""
+        start = slot * self.block_frames
+        return self._flat[start:start + self._span_frames(slot, n)]
+
+    def data(self, slot, n=1):
+        """Zero-copy byte buffer of a span, suitable for KaldiRecognizer.AcceptWaveform."""
+        start = slot * self.block_frames * 2
+        end = start + self._span_frames(slot, n) * 2
+        if self._cdata is not None:
+            return self._cdata[start:end]
+        return bytes(self._bytes[start:end])
+
+    def clear(self):
+        """Drop any queued audio (e.g. when the stream is reopened)."""
+        with self._cond:
+            self._read = self._write
+            self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "fill": self._count,
+            "max_fill": self.max_fill,
+            "blocks_written": self.blocks_written,
+            "blocks_read": self.blocks_read,
+            "overruns": self.overruns,
+        }
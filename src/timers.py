@@ -0,0 +1,88 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+class TimerHandle:
+    """A scheduled call; cancel() stops it if it hasn't run yet."""
+
+    __slots__ = ("deadline", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """Runs callbacks at monotonic-clock deadlines from one background thread.
+
+    Deadlines sit in a heap, so scheduling and firing are O(log n) and many
+    timers cost one thread between them. Cancelled timers are not removed
+    right away; they are skipped when they reach the top of the heap. The
+    thread sleeps until the earliest deadline (or a new, earlier one), so
+    timers fire on time whether or not audio is arriving, and clock changes
+    (NTP, DST) don't move them.
+
+    Callbacks run on the scheduler thread and should be short; anything
+    that touches shared state must take the owner's lock.
+    """
+
+    def __init__(self, name="timers"):
+        self.name = name
+        self._heap = [] # (deadline, sequence, handle)
+        self._sequence = itertools.count() # Keeps equal deadlines in scheduling order
+        self._cond = threading.Condition()
+        self._thread = None
+        self.fired = 0
+        self.late_ms_max = 0.0 # Worst delay past a deadline, to check the scheduler keeps up
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(time.monotonic() + delay, callback, *args)
+
+    def call_at(self, deadline, callback, *args):
+        """Run callback(*args) at `deadline` on the time.monotonic() clock."""
+        handle = TimerHandle(deadline, callback, args)
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, next(self._sequence), handle))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            elif self._heap[0][2] is handle:
+                self._cond.notify() # New earliest deadline; wake the thread to wait less
+        return handle
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for _, _, handle in self._heap if not handle.cancelled)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        handle = heapq.heappop(self._heap)[2]
+                        break
+                    self._cond.wait(delay)
+            late_ms = (time.monotonic() - handle.deadline) * 1000.0
+            self.late_ms_max = max(self.late_ms_max, late_ms)
+            self.fired += 1
+            try:
+                handle.callback(*handle.args)
+            except Exception as e:
+                logging.error(f"Timer callback {getattr(handle.callback, '__name__', handle.callback)} failed: {e}")
+
+    def stats(self):
+        return {"pending": self.pending(), "fired": self.fired, "late_ms_max": self.late_ms_max}
@@ -77,14 +77,36 @@ class TrayIcon:
             pass
         self.root = None
 
+    def run_enroll(self):
+        # Same threading dance as run_settings; the mic is released while the takes are recorded
+        was_paused = self.listener.paused
+        self.listener.set_paused(True)
+        self.root = ctk.CTk()
+        self.root.withdraw()
+
+        from gui import EnrollWindow
+
+        def on_enroll_close(enrolled):
+            if enrolled:
+                self.reload_listener_config()
+            if not was_paused:
+                self.listener.set_paused(False)
+            self.root.quit()
+
+        EnrollWindow(self.root, "config.json", on_enroll_close)
+        self.root.mainloop()
+        try:
+            self.root.destroy()
+        except:
+            pass
+        self.root = None
+
     def reload_listener_config(self):
         import json
         try:
             with open('config.json', 'r') as f:
                 new_conf = json.load(f)
-                self.listener.config = new_conf
-                self.listener.wake_phrase = new_conf.get("wake_phrase", "wake up").lower()
-                self.listener.trigger_phrase = new_conf.get("trigger_phrase", "open").lower()
+                self.listener.reload_config(new_conf) # Rebuilds the grammar in the background
                 self.listener.launcher.apps = new_conf.get("apps", [])
                 print("Config reloaded.")
         except Exception as e:
@@ -97,6 +119,8 @@ class TrayIcon:
             icon.stop()
             if self.root:
                 self.root.quit()
+            from log_setup import stop_logging
+            stop_logging() # os._exit skips atexit, so flush the log queue first
             os._exit(0)
         elif txt == 'Resume Listening':
             self.listener.set_paused(False)
@@ -118,7 +142,13 @@ class TrayIcon:
         t = threading.Thread(target=self.run_settings)
         t.start()
 
+    def show_enroll_safe(self, icon, item):
+        t = threading.Thread(target=self.run_enroll)
+        t.start()
+
     def get_status_text(self, item):
+        if not self.listener.ready.is_set():
+            return "Status: Starting..."
         return "Status: Paused" if self.listener.paused else "Status: Listening"
 
     def get_toggle_text(self, item):
@@ -137,6 +167,7 @@ class TrayIcon:
             pystray.MenuItem(self.get_toggle_text, self.on_clicked),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem('Configure Apps', self.show_settings_safe),
+            pystray.MenuItem('Enroll Wake Phrase', self.show_enroll_safe),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem('Add to Startup', self.on_clicked),
             pystray.MenuItem('Remove Startup', self.on_clicked),
@@ -0,0 +1,187 @@
+import numpy as np
+
+
+class EnergyVAD:
+    """Cheap voice activity detector based on short-frame RMS and zero crossings.
+
+    Each block is split into 10 ms frames and analysed in one vectorized pass.
+    A frame counts as speech when its energy is well above the adaptive noise
+    floor, or moderately above it with a high zero-crossing rate (unvoiced
+    onsets like "s"/"h" are quiet but noisy). The noise floor follows the
+    room level only while no speech is detected.
+
+    A block is speech when min_speech_frames of its frames are, counted over
+    at least the last window_frames frames. The window reaches back into
+    earlier blocks, so blocks shorter than min_speech_frames (e.g. 20 ms)
+    can still open the gate.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=10, threshold_ratio=3.0,
+                 min_rms=200.0, zcr_threshold=0.25, min_speech_frames=3, floor_adapt=0.05, window_frames=10):
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.zcr_threshold = zcr_threshold
+        self.min_speech_frames = min_speech_frames
+        self.floor_adapt = floor_adapt
+        self.window_frames = max(window_frames, min_speech_frames)
+        self.noise_floor = None
+        self._scratch = np.empty(0, dtype=np.float32)
+        self._recent = np.zeros(0, dtype=bool) # Speech flags of the last window_frames frames
+
+    def is_speech(self, samples):
+        n = (len(samples) // self.frame_len) * self.frame_len
+        if n == 0:
+            return False
+        if len(self._scratch) < n:
+            self._scratch = np.empty(n, dtype=np.float32)
+        frames = self._scratch[:n]
+        np.copyto(frames, samples[:n], casting='unsafe')
+        frames = frames.reshape(-1, self.frame_len)
+
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_len - 1)
+
+        block_level = float(np.mean(rms))
+        if self.noise_floor is None:
+            self.noise_floor = block_level
+
+        threshold = max(self.noise_floor * self.threshold_ratio, self.min_rms)
+        voiced = rms > threshold
+        unvoiced = (rms > threshold * 0.5) & (zcr > self.zcr_threshold)
+        flags = np.concatenate((self._recent, voiced | unvoiced))
+        speech = int(np.count_nonzero(flags[-max(len(rms), self.window_frames):])) >= self.min_speech_frames
+        self._recent = flags[-self.window_frames:]
+
+        if not speech:
+            # Drop quickly when the room gets quieter, rise slowly when it gets louder
+            if block_level < self.noise_floor:
+                self.noise_floor = block_level
+            else:
+                self.noise_floor += self.floor_adapt * (block_level - self.noise_floor)
+        return speech
+
+    def reset(self):
+        self._recent = self._recent[:0]
+
+
+class VoiceGate:
+    """Decides which blocks are worth sending to the recognizer.
+
+    Wraps any detector with an is_speech(samples) method. While closed, the
+    most recent audio is kept as pre-roll so the start of an utterance is not
+    clipped when the gate opens; after speech ends the gate stays open for a
+    hangover period so Vosk sees the trailing silence it needs to end the
+    utterance. Both are measured in samples, so blocks may vary in size.
+    """
+
+    SKIP = "skip"    # Silence, don't decode
+    OPEN = "open"    # Speech onset: decode preroll() then this block
+    PASS = "pass"    # Gate open: decode this block
+    CLOSE = "close"  # Hangover expired: decode this block, then flush the recognizer
+
+    def __init__(self, detector, preroll_samples=8000, hangover_samples=16000):
+        self.detector = detector
+        self.hangover_samples = hangover_samples
+        self.is_open = False
+        self._hangover = 0
+
+        # Pre-roll ring, allocated once
+        self._preroll = np.zeros(preroll_samples, dtype=np.int16)
+        self._preroll_pos = 0
+        self._preroll_count = 0
+
+        # Counters
+        self.blocks_total = 0
+        self.blocks_passed = 0
+        self.blocks_skipped = 0
+        self.samples_total = 0
+        self.samples_skipped = 0
+        self.onsets = 0
+
+    def process(self, samples):
+        self.blocks_total += 1
+        self.samples_total += len(samples)
+        speech = self.detector.is_speech(samples)
+
+        if self.is_open:
+            self.blocks_passed += 1
+            if speech:
+                self._hangover = self.hangover_samples
+                return self.PASS
+            self._hangover -= len(samples)
+            if self._hangover > 0:
+                return self.PASS
+            self.is_open = False
+            return self.CLOSE
+
+        if speech:
+            self.is_open = True
+            self._hangover = self.hangover_samples
+            self.onsets += 1
+            self.blocks_passed += 1
+            return self.OPEN
+
+        self.blocks_skipped += 1
+        self.samples_skipped += len(samples)
+        self._remember(samples)
+        return self.SKIP
+
+    def _remember(self, samples):
+        size = len(self._preroll)
+        if size == 0:
+            return
+        samples = samples[-size:]
+        n = len(samples)
+        first = min(n, size - self._preroll_pos)
+        self._preroll[self._preroll_pos:self._preroll_pos + first] = samples[:first]
+        self._preroll[:n - first] = samples[first:]
+        self._preroll_pos = (self._preroll_pos + n) % size
+        self._preroll_count = min(self._preroll_count + n, size)
+
+    def preroll(self):
+        """Return the buffered pre-roll audio (oldest first) as bytes and clear it."""
+        if self._preroll_count == 0:
+            return []
+        size = len(self._preroll)
+        start = (self._preroll_pos - self._preroll_count) % size
+        if start + self._preroll_count <= size:
+            audio = self._preroll[start:start + self._preroll_count].tobytes()
+        else:
+            audio = self._preroll[start:].tobytes() + self._preroll[:self._preroll_pos].tobytes()
+        self._preroll_count = 0
+        return [audio]
+
+    def reset(self):
+        self.is_open = False
+        self._hangover = 0
+        self._preroll_count = 0
+        if hasattr(self.detector, "reset"):
+            self.detector.reset()
+
+    def stats(self):
+        return {
+            "blocks_total": self.blocks_total,
+            "blocks_passed": self.blocks_passed,
+            "blocks_skipped": self.blocks_skipped,
+            "onsets": self.onsets,
+            "skipped_fraction": self.samples_skipped / (self.samples_total or 1),
+            "noise_floor": getattr(self.detector, "noise_floor", None),
+        }
+
+
+def create_voice_gate(config, sample_rate):
+    """Build the VAD gate described by config, or None if it is disabled."""
+    if not config.get("vad_enabled", True):
+        return None
+    detector = EnergyVAD(
+        sample_rate=sample_rate,
+        threshold_ratio=config.get("vad_threshold_ratio", 3.0),
+        min_rms=config.get("vad_min_rms", 200.0),
+    )
+    return VoiceGate(
+        detector,
+        preroll_samples=int(sample_rate * config.get("vad_preroll_ms", 500) / 1000),
+        hangover_samples=int(sample_rate * config.get("vad_hangover_ms", 1000) / 1000),
+    )